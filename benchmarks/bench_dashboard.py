@@ -0,0 +1,329 @@
+# Mide los dashboards completos con datos sintéticos de distintos tamaños.
+# Para cada tamaño se genera un data.csv con benchmarks/generar_facturas.py y:
+#  - capa de cálculo: se ejecutan en este proceso los mismos pasos que hace el
+#    dashboard (conversión a Parquet y lectura, o recorrido por bloques si el
+#    archivo supera por_bloques.LIMITE_MB; cubo, series, resúmenes,
+#    correlaciones, índices) y, por escenario de filtros, el filtrado y los
+#    agregados de la sección 2;
+#  - cada dashboard con AppTest, sin navegador: la primera ejecución (carga en
+#    frío) y luego, con el perfilado activado (perfilado.py), cada sección, la
+#    sección 2 con todas las subsecciones desplegadas y un cambio de filtro.
+#    El dibujo de los gráficos se mide aquí.
+# Cada parte se ejecuta dos veces: los tiempos salen de una pasada sin
+# tracemalloc, que hace varias veces más lento el código Python, y el pico de
+# memoria de cada etapa de otra pasada con él (se omite con --sin-memoria).
+# Los resultados se imprimen y, con --informe, se guardan en JSON. Con
+# --umbrales se comparan con los tiempos máximos de benchmarks/umbrales.json y
+# el proceso termina con error si alguna etapa los supera o si el archivo no
+# tiene umbrales para alguno de los tamaños pedidos.
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_dashboard --filas 10000 100000 1000000 10000000 --informe informe.json
+#     python -m benchmarks.bench_dashboard --filas 10000 100000 --umbrales
+#     python -m benchmarks.bench_dashboard --filas 10000 100000 --guardar-umbrales 3
+#
+# --guardar-umbrales F escribe como umbral F veces el tiempo medido (los
+# umbrales dependen de la máquina: conviene regenerarlos en la que se use).
+# Los de benchmarks/umbrales.json, para 10.000 y 100.000 filas, se midieron en
+# un contenedor Linux de un procesador con --sin-memoria --guardar-umbrales 3.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_filtros import escenarios
+from benchmarks.generar_facturas import escribir_facturas
+from carga_datos import DIR_PARQUET, convertir_a_parquet, leer_parquet, version_archivo
+from correlacion import MotorCorrelacion
+from cubo import construir_cubo, contar_por, extremos_por, sumar_por
+from estadisticas import ResumenesCeldas
+from filtros import IndiceFiltros
+import perfilado
+from muestreo import muestra_estratificada
+from por_bloques import agregar_archivo, usar_modo_bloques
+from series_tiempo import SeriesTiempo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARDS = ['dashboard_grupo39.py', 'dashboard_G39.py']
+RUTA_UMBRALES = os.path.join(RAIZ, 'benchmarks', 'umbrales.json')
+# Umbral mínimo: las etapas de menos de un milisegundo varían más que su propio tiempo
+UMBRAL_MINIMO_MS = 20.0
+SECCIONES = [
+    "1. Selección de Variables Clave",
+    "2. Análisis Gráfico de las Ventas",
+    "3. Gráficos Compuestos",
+    "4. Visualización 3D",
+]
+# Espera máxima de AppTest por ejecución del script (la primera carga de 10M filas es larga)
+TIMEOUT_S = 3600
+
+
+def medir(resultados, capa, etapa, funcion, filas=None):
+    """Ejecuta `funcion()` y añade a `resultados` su tiempo o, con tracemalloc activo, su pico de memoria."""
+    trazando = tracemalloc.is_tracing()
+    if trazando:
+        tracemalloc.reset_peak()
+        memoria = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    valor = funcion()
+    segundos = time.perf_counter() - inicio
+    resultados.append({
+        'capa': capa, 'etapa': etapa,
+        'ms': None if trazando else segundos * 1000,
+        'pico_mb': (tracemalloc.get_traced_memory()[1] - memoria) / 2**20 if trazando else None,
+        'filas': filas(valor) if filas else None,
+    })
+    return valor
+
+
+def agregados_seccion_2(cubo, series, resumenes, motor, vista, celdas, selecciones, rango):
+    # Lo que calcula la sección 2 con todas las subsecciones desplegadas
+    seleccion = cubo.iloc[celdas]
+    return [
+        series.serie(selecciones, rango),
+        sumar_por(seleccion, 'Product line'),
+        resumenes.histograma(celdas),
+        resumenes.describir_por(celdas, 'Customer type').join(extremos_por(seleccion, 'Customer type')),
+        motor.momentos_pareados(celdas, 'cogs', 'gross income'),
+        muestra_estratificada(vista)[['cogs', 'gross income', 'Product line']],
+        contar_por(seleccion, 'Payment'),
+        motor.correlacion(celdas),
+        sumar_por(seleccion, ['Branch', 'Product line'], 'gross income'),
+        series.por_hora(selecciones, rango),
+    ]
+
+
+def medir_calculo(ruta, memoria=False):
+    """Etapas de carga, filtrado y agregación de la capa de cálculo para el CSV `ruta`.
+
+    Con `memoria` se mide el pico de memoria de cada etapa en lugar del tiempo.
+    """
+    resultados = []
+    capa = 'cálculo'
+    if memoria:
+        tracemalloc.start()
+    try:
+        if usar_modo_bloques(ruta):
+            agregados = medir(resultados, capa, 'por bloques', lambda: agregar_archivo(ruta), lambda a: a.filas)
+            data, cubo, series = agregados.muestra, agregados.cubo, agregados.series
+            resumenes, motor = agregados.resumenes, agregados.motor
+        else:
+            destino = os.path.join(os.path.dirname(ruta), DIR_PARQUET)
+            medir(resultados, capa, 'conversión a parquet', lambda: convertir_a_parquet(ruta, destino, version_archivo(ruta)))
+            data, _ = medir(resultados, capa, 'lectura', lambda: leer_parquet(destino), lambda v: len(v[0]))
+            cubo = medir(resultados, capa, 'cubo', lambda: construir_cubo(data), len)
+            series = medir(resultados, capa, 'series', lambda: SeriesTiempo.desde_datos(data))
+            resumenes = medir(resultados, capa, 'resúmenes', lambda: ResumenesCeldas.desde_datos(data))
+            motor = medir(resultados, capa, 'correlaciones', lambda: MotorCorrelacion.desde_datos(data))
+        indice = medir(resultados, capa, 'índice de filas', lambda: IndiceFiltros(data))
+        indice_celdas = medir(resultados, capa, 'índice de celdas', lambda: IndiceFiltros(cubo))
+
+        for nombre, (selecciones, rango) in escenarios(data).items():
+            vista = medir(resultados, capa, f'filtro · {nombre}', lambda: indice.vista(data, selecciones, rango), len)
+            celdas = medir(resultados, capa, f'celdas · {nombre}', lambda: indice_celdas.indices(selecciones, rango), len)
+            medir(resultados, capa, f'agregados · {nombre}', lambda: agregados_seccion_2(
+                cubo, series, resumenes, motor, vista, celdas, selecciones, rango,
+            ))
+    finally:
+        if memoria:
+            tracemalloc.stop()
+    return resultados
+
+
+def _ultima_ejecucion(at):
+    registros = [r for r in at.session_state['perfilado'] if r['ejecucion'] == 'completa']
+    return registros[-1]
+
+
+def _ejecutar(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def medir_dashboard(script, directorio, memoria=False):
+    """Primera ejecución y etapas perfiladas de `script` sobre el data.csv de `directorio`.
+
+    Con `memoria` el perfilado mide el pico de memoria de cada etapa (y los
+    tiempos no se registran, porque incluyen el costo de tracemalloc).
+    """
+    resultados = []
+    # Carga en frío: sin cachés de Streamlit ni copia Parquet de una medición anterior
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    shutil.rmtree(os.path.join(directorio, DIR_PARQUET), ignore_errors=True)
+    anterior = os.getcwd()
+    os.chdir(directorio)
+    perfilado.MEDIR_MEMORIA = memoria
+    try:
+        at = AppTest.from_file(os.path.join(RAIZ, script), default_timeout=TIMEOUT_S)
+        inicio = time.perf_counter()
+        _ejecutar(at)
+        if not memoria:
+            resultados.append({
+                'capa': script, 'etapa': 'primera ejecución', 'ms': (time.perf_counter() - inicio) * 1000,
+                'pico_mb': None, 'filas': None,
+            })
+        at.sidebar.toggle[0].set_value(True)
+
+        pasos = []
+        for seccion in SECCIONES:
+            at.sidebar.radio[0].set_value(seccion)
+            _ejecutar(at)
+            pasos.append((seccion[:1], _ultima_ejecucion(at)))
+        # De vuelta en la sección 2, se despliegan todas las subsecciones
+        at.sidebar.radio[0].set_value(SECCIONES[1])
+        _ejecutar(at)
+        for toggle in at.main.toggle:
+            toggle.set_value(True)
+        _ejecutar(at)
+        pasos.append(('2 completa', _ultima_ejecucion(at)))
+        pagos = at.sidebar.multiselect[4]
+        pagos.set_value(pagos.value[:-1])
+        _ejecutar(at)
+        pasos.append(('2 filtro', _ultima_ejecucion(at)))
+    finally:
+        perfilado.MEDIR_MEMORIA = False
+        os.chdir(anterior)
+
+    for paso, registro in pasos:
+        resultados.append({
+            'capa': script, 'etapa': f'{paso} · total', 'ms': None if memoria else registro['segundos'] * 1000,
+            'pico_mb': registro['pico_mb'], 'filas': None,
+        })
+        for etapa in registro['etapas']:
+            if etapa['nivel'] == 0:
+                resultados.append({
+                    'capa': script, 'etapa': f"{paso} · {etapa['etapa']}",
+                    'ms': None if memoria else etapa['segundos'] * 1000,
+                    'pico_mb': etapa.get('pico_mb'), 'filas': etapa.get('filas'),
+                })
+    return resultados
+
+
+def unir_pasadas(tiempos, memoria):
+    """Resultados de la pasada de tiempos con el pico de memoria de cada etapa en la pasada con tracemalloc."""
+    picos = {clave(r): r['pico_mb'] for r in memoria}
+    return [{**r, 'pico_mb': picos.get(clave(r))} for r in tiempos]
+
+
+def clave(resultado):
+    return f"{resultado['capa']} · {resultado['etapa']}"
+
+
+def comparar(filas, resultados, umbrales):
+    """Etapas de `resultados` que superan su umbral para `filas` filas."""
+    limites = umbrales.get(str(filas), {})
+    return [
+        (clave(r), r['ms'], limites[clave(r)])
+        for r in resultados if clave(r) in limites and r['ms'] > limites[clave(r)]
+    ]
+
+
+def umbrales_de(resultados, factor):
+    # Solo las etapas de la capa de cálculo y los totales de cada paso de los dashboards
+    return {
+        clave(r): max(round(r['ms'] * factor, 1), UMBRAL_MINIMO_MS)
+        for r in resultados if r['capa'] == 'cálculo' or r['etapa'].endswith('total') or r['etapa'] == 'primera ejecución'
+    }
+
+
+def imprimir(filas, resultados):
+    tabla = pd.DataFrame(resultados).set_index(['capa', 'etapa'])
+    with pd.option_context('display.width', 140, 'display.max_rows', None, 'display.float_format', '{:.1f}'.format):
+        print(f"\n{filas:,} filas")
+        print(tabla.to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--directorio', default=os.path.join(tempfile.gettempdir(), 'g39_benchmark'))
+    parser.add_argument('--dashboards', nargs='*', default=DASHBOARDS)
+    parser.add_argument('--sin-calculo', action='store_true', help='solo los dashboards con AppTest')
+    parser.add_argument('--sin-memoria', action='store_true', help='sin la pasada que mide la memoria')
+    parser.add_argument('--informe', help='ruta del informe JSON')
+    parser.add_argument('--umbrales', action='store_true', help=f'comparar con {os.path.relpath(RUTA_UMBRALES, RAIZ)}')
+    parser.add_argument('--guardar-umbrales', type=float, metavar='FACTOR')
+    args = parser.parse_args()
+
+    # Los dashboards se ejecutan con el directorio de los datos como directorio actual
+    sys.path.insert(0, RAIZ)
+    umbrales = {}
+    if os.path.exists(RUTA_UMBRALES):
+        with open(RUTA_UMBRALES, encoding='utf-8') as f:
+            umbrales = json.load(f)
+    if args.umbrales:
+        # Sin umbral para un tamaño no hay con qué comparar: es un error, no un éxito
+        faltan = [filas for filas in args.filas if str(filas) not in umbrales]
+        if faltan:
+            parser.error(
+                f"{os.path.relpath(RUTA_UMBRALES, RAIZ)} no tiene umbrales para "
+                f"{', '.join(f'{filas:,}' for filas in faltan)} filas (se generan con --guardar-umbrales)"
+            )
+
+    informe = {
+        'maquina': {
+            'python': platform.python_version(), 'pandas': pd.__version__, 'streamlit': st.__version__,
+            'procesadores': os.cpu_count(), 'sistema': platform.platform(),
+        },
+        'tamanos': [],
+    }
+    regresiones = []
+    for filas in args.filas:
+        directorio = os.path.join(args.directorio, f'facturas_{filas}')
+        ruta = os.path.join(directorio, 'data.csv')
+        if not os.path.exists(ruta):
+            inicio = time.perf_counter()
+            escribir_facturas(ruta, filas)
+            print(f"{filas:,} facturas generadas en {time.perf_counter() - inicio:.1f} s")
+
+        pasadas = [False] if args.sin_memoria else [False, True]
+        resultados, picos = [], []
+        for memoria, destino in zip(pasadas, [resultados, picos]):
+            if not args.sin_calculo:
+                destino += medir_calculo(ruta, memoria)
+            for script in args.dashboards:
+                destino += medir_dashboard(script, directorio, memoria)
+        resultados = unir_pasadas(resultados, picos)
+        imprimir(filas, resultados)
+        informe['tamanos'].append({
+            'filas': filas,
+            'csv_mb': os.path.getsize(ruta) / 2**20,
+            'modo_bloques': usar_modo_bloques(ruta),
+            'resultados': resultados,
+        })
+        regresiones += [(filas, *r) for r in comparar(filas, resultados, umbrales)]
+        if args.guardar_umbrales:
+            umbrales[str(filas)] = umbrales_de(resultados, args.guardar_umbrales)
+
+    # ru_maxrss está en KB en Linux
+    informe['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nPico de memoria del proceso: {informe['pico_rss_mb']:.0f} MB")
+    if args.informe:
+        with open(args.informe, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+    if args.guardar_umbrales:
+        with open(RUTA_UMBRALES, 'w', encoding='utf-8') as f:
+            json.dump(umbrales, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.umbrales and regresiones:
+        print("\nEtapas por encima de su umbral:")
+        for filas, nombre, ms, limite in regresiones:
+            print(f"  {filas:,} filas · {nombre}: {ms:.1f} ms (umbral {limite:.1f} ms)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Compara la tabla de estadísticas por tipo de cliente y el histograma de
+# calificaciones de estadisticas.py con los resultados exactos de pandas
+# (describe y value_counts sobre las filas filtradas), y comprueba que los
+# cuartiles respetan la cota de error de rango 1/K.
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_estadisticas --filas 1000000 5000000 --dias 60
+#
+# Con pocos días cada celda tiene más de K filas y el resumen de cuantiles
+# deja de ser exacto; con muchos días (--dias 1095) casi todas son exactas.
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_filtros import cronometrar, datos_ampliados, escenarios
+from cubo import construir_cubo
+from estadisticas import PUNTOS_CUANTILES, ResumenesCeldas
+from filtros import IndiceFiltros
+
+CUANTILES = (0.25, 0.5, 0.75)
+
+
+def exacto(filtrado):
+    describe = filtrado.groupby('Customer type', observed=True)['Total'].describe()
+    histograma = filtrado['Rating'].round(1).value_counts().sort_index()
+    return describe, histograma
+
+
+def error_de_rango(filtrado, resumen):
+    """Mayor distancia entre q y el rango relativo (en las filas reales) del cuantil estimado."""
+    peor = 0.0
+    for tipo, grupo in filtrado.groupby('Customer type', observed=True)['Total']:
+        valores = np.sort(grupo.to_numpy(dtype='float64'))
+        for q in CUANTILES:
+            estimado = resumen.loc[tipo, f'{q:.0%}']
+            bajo = np.searchsorted(valores, estimado, side='left') / len(valores)
+            alto = np.searchsorted(valores, estimado, side='right') / len(valores)
+            peor = max(peor, 0.0 if bajo <= q <= alto else min(abs(q - bajo), abs(q - alto)))
+    return peor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--dias', type=int, default=60)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        data = datos_ampliados(filas, dias=args.dias)
+        inicio = time.perf_counter()
+        cubo = construir_cubo(data)
+        resumenes = ResumenesCeldas.desde_datos(data)
+        construccion = time.perf_counter() - inicio
+        indice_filas, indice_celdas = IndiceFiltros(data), IndiceFiltros(cubo)
+        print(f"\n{filas:,} filas ({len(cubo):,} celdas, {len(resumenes.valor):,} puntos; "
+              f"cubo y resúmenes en {construccion:.2f} s)")
+        print(f"{'escenario':<22}{'pandas':>12}{'resúmenes':>12}{'aceleración':>14}{'error rango':>14}")
+        for nombre, (selecciones, rango) in escenarios(data).items():
+            filtrado = indice_filas.filtrar(data, selecciones, rango)
+            celdas = indice_celdas.indices(selecciones, rango)
+            t_exacto, (describe, histograma) = cronometrar(lambda: exacto(filtrado), args.repeticiones)
+            t_resumen, (resumen, barras) = cronometrar(
+                lambda: (resumenes.describir_por(celdas, 'Customer type', CUANTILES), resumenes.histograma(celdas)),
+                args.repeticiones,
+            )
+
+            assert np.array_equal(describe['count'].to_numpy(), resumen['count'].to_numpy()), nombre
+            assert np.allclose(describe['mean'], resumen['mean'], rtol=1e-6), nombre
+            assert np.allclose(describe['std'], resumen['std'], rtol=1e-6), nombre
+            assert np.array_equal(histograma.to_numpy(), barras['conteo'].to_numpy()), nombre
+            error = error_de_rango(filtrado, resumen)
+            assert error <= 1 / PUNTOS_CUANTILES, (nombre, error)
+            print(f"{nombre:<22}{t_exacto * 1000:>10.1f}ms{t_resumen * 1000:>10.1f}ms"
+                  f"{t_exacto / t_resumen:>13.1f}x{error:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Compara el filtrado por cadena de máscaras (versión original del dashboard)
+# con el motor de bitmaps de filtros.py.
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.bench_filtros --filas 1000000 10000000
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import COLUMNAS_CATEGORICAS, leer_datos
+from filtros import IndiceFiltros
+
+
+def datos_ampliados(filas, semilla=39, dias=3 * 365):
+    """Re-muestrea data.csv hasta `filas` filas, repartiendo las fechas en `dias` días (tres años)."""
+    base, _ = leer_datos('data.csv')
+    base = base.drop(columns='Invoice ID')
+    rng = np.random.default_rng(semilla)
+    data = base.iloc[rng.integers(0, len(base), filas)].reset_index(drop=True)
+    desplazamiento = rng.integers(0, dias, filas).astype('timedelta64[D]')
+    data['Date'] = np.datetime64('2019-01-01', 'us') + desplazamiento
+    return data.sort_values('Date', kind='stable', ignore_index=True)
+
+
+def filtrar_con_mascaras(data, selecciones, rango):
+    mascara = (data['Date'] >= pd.to_datetime(rango[0])) & (data['Date'] <= pd.to_datetime(rango[1]))
+    for col, valores in selecciones.items():
+        mascara &= data[col].isin(valores)
+    return data[mascara]
+
+
+def escenarios(data):
+    todos = {col: list(data[col].unique()) for col in COLUMNAS_CATEGORICAS}
+    inicio, fin = data['Date'].min(), data['Date'].max()
+    return {
+        'sin filtros': (todos, (inicio, fin)),
+        'un pago menos': ({**todos, 'Payment': todos['Payment'][:-1]}, (inicio, fin)),
+        'un mes, dos líneas': (
+            {**todos, 'Product line': todos['Product line'][:2]},
+            (inicio, inicio + pd.Timedelta(days=30)),
+        ),
+    }
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        data = datos_ampliados(filas)
+        inicio = time.perf_counter()
+        indice = IndiceFiltros(data)
+        construccion = time.perf_counter() - inicio
+        print(f"\n{filas:,} filas (índice construido en {construccion:.2f} s)")
+        print(f"{'escenario':<22}{'máscaras':>12}{'bitmaps':>12}{'aceleración':>14}")
+        for nombre, (selecciones, rango) in escenarios(data).items():
+            t_mascaras, esperado = cronometrar(lambda: filtrar_con_mascaras(data, selecciones, rango), args.repeticiones)
+            t_bitmaps, obtenido = cronometrar(lambda: indice.filtrar(data, selecciones, rango), args.repeticiones)
+            assert esperado.index.equals(obtenido.index), nombre
+            print(f"{nombre:<22}{t_mascaras * 1000:>10.1f}ms{t_bitmaps * 1000:>10.1f}ms{t_mascaras / t_bitmaps:>13.1f}x")
+
+
+if __name__ == '__main__':
+    main()
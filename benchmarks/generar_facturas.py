@@ -0,0 +1,96 @@
+# Generador de facturas sintéticas con el mismo esquema de 17 columnas que
+# data.csv, para medir los dashboards con más filas de las 1.000 originales.
+# Las columnas categóricas se toman juntas de filas de data.csv (se conserva
+# la distribución conjunta: sucursal y ciudad, tipo de cliente, género, línea y
+# pago); precio, cantidad, calificación, fecha y hora se sortean en los mismos
+# rangos que los datos reales, y los impuestos, costos e ingresos se calculan
+# como en el original.
+#
+# Uso (desde la raíz del repositorio):
+#     python -m benchmarks.generar_facturas 10000000 /tmp/g39/data.csv
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from carga_datos import COLUMNAS_CATEGORICAS, RUTA_DATOS
+
+COLUMNAS = [
+    'Invoice ID', 'Branch', 'City', 'Customer type', 'Gender', 'Product line', 'Unit price', 'Quantity',
+    'Tax 5%', 'Total', 'Date', 'Time', 'Payment', 'cogs', 'gross margin percentage', 'gross income', 'Rating',
+]
+# Filas generadas y escritas por vez: acota la memoria con 10M+ filas
+FILAS_POR_BLOQUE = 1_000_000
+# Invoice ID único: i -> (A i + B) mod 10^9 es una biyección porque A es coprimo con 10^9
+_A, _B, _MODULO = 738_219_461, 104_729, 10**9
+
+
+def _textos_fechas(inicio, dias):
+    # Una cadena por día (formato m/d/aaaa de data.csv); las filas solo la indexan
+    fechas = pd.date_range(inicio, periods=dias, freq='D')
+    return np.array([f"{f.month}/{f.day}/{f.year}" for f in fechas], dtype=object)
+
+
+def _textos_horas():
+    # Horario de apertura de data.csv: de 10:00 a 20:59
+    return np.array([f"{h}:{m:02d}" for h in range(10, 21) for m in range(60)], dtype=object)
+
+
+def _invoice_ids(primera, filas):
+    numeros = (np.arange(primera, primera + filas, dtype='int64') * _A + _B) % _MODULO
+    texto = pd.Series(numeros).astype(str).str.zfill(9)
+    return (texto.str[:3] + '-' + texto.str[3:5] + '-' + texto.str[5:]).to_numpy()
+
+
+def generar_bloque(base, filas, rng, primera=0, inicio='2019-01-01', dias=3 * 365):
+    """`filas` facturas sintéticas (DataFrame con las columnas de data.csv, como texto las fechas)."""
+    categoricas = base[COLUMNAS_CATEGORICAS].iloc[rng.integers(0, len(base), filas)].reset_index(drop=True)
+    precio = np.round(rng.uniform(10, 100, filas), 2)
+    cantidad = rng.integers(1, 11, filas)
+    cogs = np.round(precio * cantidad, 2)
+    impuesto = np.round(cogs * 0.05, 4)
+    bloque = categoricas.assign(**{
+        'Invoice ID': _invoice_ids(primera, filas),
+        'Unit price': precio,
+        'Quantity': cantidad,
+        'Tax 5%': impuesto,
+        'Total': np.round(cogs + impuesto, 4),
+        'Date': _textos_fechas(inicio, dias)[rng.integers(0, dias, filas)],
+        'Time': _textos_horas()[rng.integers(0, 11 * 60, filas)],
+        'cogs': cogs,
+        'gross margin percentage': 4.761904762,
+        'gross income': impuesto,
+        'Rating': rng.integers(40, 101, filas) / 10,
+    })
+    return bloque[COLUMNAS]
+
+
+def escribir_facturas(ruta, filas, semilla=39, base=RUTA_DATOS, **kwargs):
+    """Escribe en `ruta` un CSV de `filas` facturas sintéticas, por bloques de FILAS_POR_BLOQUE."""
+    categorias = pd.read_csv(base, usecols=COLUMNAS_CATEGORICAS)
+    rng = np.random.default_rng(semilla)
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', newline='') as f:
+        for primera in range(0, filas, FILAS_POR_BLOQUE):
+            bloque = generar_bloque(categorias, min(FILAS_POR_BLOQUE, filas - primera), rng, primera, **kwargs)
+            bloque.to_csv(f, index=False, header=primera == 0)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filas', type=int)
+    parser.add_argument('ruta')
+    parser.add_argument('--semilla', type=int, default=39)
+    parser.add_argument('--dias', type=int, default=3 * 365)
+    args = parser.parse_args()
+    escribir_facturas(args.ruta, args.filas, args.semilla, dias=args.dias)
+    print(f"{args.filas:,} facturas en {args.ruta} ({os.path.getsize(args.ruta) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
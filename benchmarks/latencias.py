@@ -0,0 +1,44 @@
+# Latencias p50/p95 por etapa a partir del registro JSON-lines que escribe el
+# dashboard con el perfilado activo (ver perfilado.py).
+#
+# Uso (desde la raíz del repositorio):
+#     G39_PERFILADO=1 G39_PERFILADO_LOG=perfilado.jsonl streamlit run dashboard_grupo39.py
+#     python -m benchmarks.latencias perfilado.jsonl --por-seccion
+#
+# Sin --completas se incluyen también las ejecuciones de un solo fragmento
+# (desplegar una subsección de la sección 2). Las ejecuciones con el pico de
+# memoria medido (G39_PERFILADO_MEMORIA=1) son más lentas y se omiten salvo con
+# --con-memoria.
+
+import argparse
+
+import pandas as pd
+
+from perfilado import leer_registros, resumir_latencias
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('ruta')
+    parser.add_argument('--por-seccion', action='store_true')
+    parser.add_argument('--completas', action='store_true', help='solo ejecuciones completas del script')
+    parser.add_argument('--con-memoria', action='store_true', help='incluir ejecuciones con tracemalloc activo')
+    args = parser.parse_args()
+
+    registros = leer_registros(args.ruta)
+    if not args.con_memoria:
+        registros = [r for r in registros if r['pico_mb'] is None]
+    if args.completas:
+        registros = [r for r in registros if r['ejecucion'] == 'completa']
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(registro['seccion'] if args.por_seccion else 'todas', []).append(registro)
+
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        for seccion, grupo in grupos.items():
+            print(f"\n{seccion}: {len(grupo)} ejecuciones")
+            print(resumir_latencias(grupo).round(1).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Caché de figuras renderizadas.
+# Dibujar con matplotlib/seaborn es lo más caro de cada re-ejecución; la imagen
+# PNG de cada gráfico se guarda por (id del gráfico, selección, versión de los
+# datos) y se reutiliza mientras no cambien.
+
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+
+class CacheFiguras:
+    """Caché LRU de imágenes PNG limitada por tamaño total en bytes."""
+
+    def __init__(self, max_mb=200):
+        self.max_bytes = max_mb * 2**20
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._imagenes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._imagenes
+
+    def obtener_png(self, clave, generar):
+        """PNG de `clave`; si no está en caché, lo genera con `generar()` (que devuelve los bytes)."""
+        with self._lock:
+            if clave in self._imagenes:
+                self._imagenes.move_to_end(clave)
+                self.aciertos += 1
+                return self._imagenes[clave]
+            self.fallos += 1
+
+        png = generar()
+
+        with self._lock:
+            if clave not in self._imagenes:
+                self._imagenes[clave] = png
+                self.bytes += len(png)
+            while self.bytes > self.max_bytes and len(self._imagenes) > 1:
+                _, descartada = self._imagenes.popitem(last=False)
+                self.bytes -= len(descartada)
+        return png
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._imagenes),
+                'mb': self.bytes / 2**20,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+
+@st.cache_resource
+def obtener_cache_figuras():
+    """Caché única por proceso, compartida por todas las sesiones."""
+    return CacheFiguras()
+
+
+def mostrar_estadisticas(cache):
+    stats = cache.estadisticas()
+    st.sidebar.caption(
+        f"Caché de gráficos: {stats['entradas']} figuras · {stats['mb']:.1f} MB · "
+        f"{stats['aciertos']} aciertos / {stats['fallos']} fallos"
+    )
@@ -0,0 +1,254 @@
+# Capa de carga de datos para los dashboards del Grupo 39.
+# Streamlit re-ejecuta el script completo en cada interacción, por lo que la
+# lectura del CSV se hace una sola vez por versión del archivo y se comparte
+# entre re-ejecuciones y sesiones.
+# El CSV se convierte una vez a una copia Parquet particionada por sucursal y
+# mes; las cargas posteriores leen solo las columnas que usa cada sección.
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+RUTA_DATOS = 'data.csv'
+DIR_PARQUET = 'data_parquet'
+ARCHIVO_VERSION = '_version'
+COLUMNAS_PARTICION = ['Branch', 'Mes']
+
+COLUMNAS_CATEGORICAS = ['Branch', 'City', 'Customer type', 'Gender', 'Product line', 'Payment']
+COLUMNAS_DINERO = ['Unit price', 'Tax 5%', 'Total', 'cogs', 'gross income']
+COLUMNAS_NUMERICAS = ['Unit price', 'Quantity', 'Tax 5%', 'Total', 'cogs', 'gross income', 'Rating']
+# Columnas que necesitan siempre los filtros de la barra lateral y los indicadores
+COLUMNAS_FILTRO = ['Date'] + COLUMNAS_CATEGORICAS
+COLUMNAS_KPI = ['Total', 'gross income']
+
+# Tipos explícitos: evita que pandas infiera tipos fila a fila y reduce memoria
+TIPOS_COLUMNAS = {
+    'Invoice ID': 'string',
+    **{col: 'category' for col in COLUMNAS_CATEGORICAS},
+    **{col: 'float32' for col in COLUMNAS_DINERO},
+    'Quantity': 'int16',
+    'gross margin percentage': 'float32',
+    'Rating': 'float32',
+    'Date': 'string',
+    'Time': 'string',
+}
+
+
+def version_archivo(ruta=RUTA_DATOS, con_hash=False):
+    """Identifica la versión del archivo por (mtime, tamaño) o por su hash SHA-1."""
+    if con_hash:
+        sha = hashlib.sha1()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                sha.update(bloque)
+        return sha.hexdigest()
+    info = os.stat(ruta)
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+
+def preparar_tipos(data):
+    """Convierte Date/Time de texto a Date (día) y Timestamp (fecha y hora)."""
+    fechas = pd.to_datetime(data['Date'], format='%m/%d/%Y')
+    horas = pd.to_timedelta(data['Time'] + ':00')
+    data['Date'] = fechas
+    data['Timestamp'] = fechas + horas
+    return data.drop(columns='Time')
+
+
+def igualar_categorias(tablas, columnas=COLUMNAS_CATEGORICAS):
+    """`tablas` con las mismas categorías en `columnas`: las de la primera y, al final, las nuevas.
+
+    concat deja como texto las categóricas con categorías distintas; así las
+    conserva, y los códigos de la primera tabla no cambian.
+    """
+    tablas = list(tablas)
+    for col in columnas:
+        categorias = _categorias(tablas[0][col])
+        for tabla in tablas[1:]:
+            categorias = categorias.append(_categorias(tabla[col]).difference(categorias))
+        # Dos categóricas sin orden son del mismo tipo aunque sus categorías estén en
+        # otro orden: se comparan las categorías, para que los códigos coincidan
+        tablas = [
+            tabla if _mismas_categorias(tabla[col], categorias) else tabla.assign(**{col: _con_categorias(tabla[col], categorias)})
+            for tabla in tablas
+        ]
+    return tablas
+
+
+def _categorias(columna):
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        return columna.cat.categories
+    return columna.astype('category').cat.categories
+
+
+def _mismas_categorias(columna, categorias):
+    return isinstance(columna.dtype, pd.CategoricalDtype) and columna.cat.categories.equals(categorias)
+
+
+def _con_categorias(columna, categorias):
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        return columna.cat.set_categories(categorias)
+    return columna.astype(pd.CategoricalDtype(categorias))
+
+
+def leer_datos(ruta=RUTA_DATOS):
+    """Lee el CSV con tipos explícitos y devuelve (data, info_carga)."""
+    inicio = time.perf_counter()
+    data = preparar_tipos(pd.read_csv(ruta, dtype=TIPOS_COLUMNAS))
+    info = {
+        'filas': len(data),
+        'segundos': time.perf_counter() - inicio,
+        'memoria_mb': float(data.memory_usage(deep=True).sum()) / 2**20,
+    }
+    return data, info
+
+
+def leer_bloques(ruta=RUTA_DATOS, filas_por_bloque=250_000):
+    """Itera el CSV en bloques de `filas_por_bloque` filas, con los mismos tipos que leer_datos."""
+    with pd.read_csv(ruta, dtype=TIPOS_COLUMNAS, chunksize=filas_por_bloque) as lector:
+        for bloque in lector:
+            yield preparar_tipos(bloque)
+
+
+def _version_parquet(destino):
+    try:
+        with open(os.path.join(destino, ARCHIVO_VERSION)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def convertir_a_parquet(ruta=RUTA_DATOS, destino=DIR_PARQUET, version=None):
+    """Escribe una copia Parquet de `ruta` particionada por Branch y mes de Date."""
+    version = version or version_archivo(ruta)
+    data, _ = leer_datos(ruta)
+    data['Mes'] = data['Date'].dt.strftime('%Y-%m')
+    tabla = pa.Table.from_pandas(data, preserve_index=False)
+
+    # Se escribe en un directorio temporal propio (otro dashboard puede estar
+    # convirtiendo a la vez) y se pone en su lugar al final, para que una
+    # conversión interrumpida no deje una copia a medias
+    padre, nombre = os.path.split(os.path.abspath(destino))
+    temporal = tempfile.mkdtemp(dir=padre, prefix=f'{nombre}.')
+    try:
+        pq.write_to_dataset(tabla, root_path=temporal, partition_cols=COLUMNAS_PARTICION)
+        with open(os.path.join(temporal, ARCHIVO_VERSION), 'w') as f:
+            f.write(version)
+        # El cambio se hace sin lecturas en curso (ver leer_parquet)
+        with _bloqueo(destino, exclusivo=True):
+            shutil.rmtree(destino, ignore_errors=True)
+            os.replace(temporal, destino)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+
+@contextlib.contextmanager
+def _bloqueo(destino, exclusivo):
+    """Bloqueo entre procesos de la copia Parquet `destino`: compartido para leerla, exclusivo para reemplazarla."""
+    with open(destino + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def leer_parquet(destino=DIR_PARQUET, columnas=None):
+    """Lee la copia Parquet proyectando solo `columnas` (todas si es None)."""
+    inicio = time.perf_counter()
+    with _bloqueo(destino, exclusivo=False):
+        tabla = pq.read_table(destino, columns=columnas)
+    data = tabla.to_pandas()
+    data = data.drop(columns='Mes', errors='ignore')
+    # Las particiones vuelven agrupadas por sucursal; ordenar por fecha permite
+    # que el filtro de fechas sea una búsqueda binaria sobre un rango contiguo
+    if 'Date' in data:
+        data = data.sort_values('Date', kind='stable', ignore_index=True)
+    info = {
+        'filas': len(data),
+        'segundos': time.perf_counter() - inicio,
+        'memoria_mb': float(data.memory_usage(deep=True).sum()) / 2**20,
+    }
+    return data, info
+
+
+@st.cache_resource(max_entries=2, show_spinner="Convirtiendo datos a Parquet...")
+def _asegurar_parquet(ruta, destino, version):
+    # Solo se reconvierte si la copia en disco corresponde a otra versión del CSV
+    if _version_parquet(destino) != version:
+        convertir_a_parquet(ruta, destino, version)
+
+
+def leer_version(ruta, version, columnas=None):
+    """Lee `columnas` de la copia Parquet de `ruta`, convirtiéndola antes si está desactualizada."""
+    destino = os.path.join(os.path.dirname(ruta), DIR_PARQUET)
+    _asegurar_parquet(ruta, destino, version)
+    return leer_parquet(destino, list(columnas) if columnas else None)
+
+
+class VersionesEnCache:
+    """Llamadas a una función de st.cache_resource hechas con la versión vigente de los datos.
+
+    Al registrar una llamada de una versión nueva se sacan de la caché las de
+    la anterior (las sesiones que aún las usan conservan su referencia): la
+    memoria queda acotada a una versión por grupo, no a max_entries entradas.
+    """
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+        # grupo -> (versión, argumentos de cada llamada con ella)
+        self.llamadas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, grupo, version, *args):
+        with self._lock:
+            vigente, llamadas = self.llamadas.get(grupo, (version, set()))
+            if vigente != version:
+                for anteriores in llamadas:
+                    self.funcion.clear(*anteriores)
+                llamadas = set()
+            llamadas.add(args)
+            self.llamadas[grupo] = (version, llamadas)
+
+
+@st.cache_resource(max_entries=10, show_spinner="Cargando datos...")
+def _leer_datos_en_cache(ruta, version, columnas):
+    data, info = leer_version(ruta, version, columnas)
+    info['version'] = version
+    info['clave'] = (version, columnas)
+    return data, info
+
+
+def cargar_datos(ruta=RUTA_DATOS, columnas=None, con_hash=False):
+    """Carga compartida entre re-ejecuciones y sesiones; se invalida al cambiar el archivo.
+
+    `columnas` limita la lectura a esas columnas (además de las de filtros e
+    indicadores). El DataFrame devuelto es compartido: no debe modificarse en
+    el dashboard.
+    """
+    if columnas is not None:
+        columnas = tuple(dict.fromkeys(COLUMNAS_FILTRO + COLUMNAS_KPI + list(columnas)))
+    version = version_archivo(ruta, con_hash)
+    _versiones_datos.registrar(ruta, version, ruta, version, columnas)
+    return _leer_datos_en_cache(ruta, version, columnas)
+
+
+_versiones_datos = VersionesEnCache(_leer_datos_en_cache)
+
+
+def mostrar_info_carga(info):
+    st.sidebar.caption(
+        f"Datos: {info['filas']:,} filas · carga {info['segundos']:.2f} s · "
+        f"{info['memoria_mb']:.1f} MB en memoria"
+    )
@@ -0,0 +1,193 @@
+# Motor de correlación para el gráfico 2.7 y la recta y el Pearson de 2.5.
+# Por cada celda del cubo se guardan n, las medias y la matriz de productos
+# cruzados centrados (comomentos) de las columnas numéricas; para una selección
+# de celdas se combinan con la fórmula de Chan y la matriz de Pearson sale de
+# ahí, sin recorrer las filas.
+# Al cargar se detectan las columnas que son combinación lineal exacta de otra
+# (aquí cogs, Total y gross income lo son de Tax 5%): solo se guardan comomentos
+# por celda de las columnas independientes, y las demás se reconstruyen con su
+# relación lineal, que vale igual para cualquier subconjunto de filas.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import COLUMNAS_NUMERICAS, leer_version
+from cubo import DIMENSIONES
+
+# Dos columnas son colineales si 1 - |r| no supera este valor (redondeo de float32)
+TOLERANCIA_COLINEAL = 1e-9
+
+
+def comomentos_por_grupo(grupos, valores, minlength=0):
+    """(n, medias, comomentos) por grupo de las filas de `valores` (filas x columnas)."""
+    n = np.bincount(grupos, minlength=minlength).astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = np.column_stack([np.bincount(grupos, weights=col, minlength=minlength) for col in valores.T]) / n[:, None]
+    centrados = valores - medias[grupos]
+    k = valores.shape[1]
+    comomentos = np.zeros((len(n), k, k))
+    for i in range(k):
+        for j in range(i, k):
+            comomentos[:, i, j] = comomentos[:, j, i] = np.bincount(
+                grupos, weights=centrados[:, i] * centrados[:, j], minlength=minlength,
+            )
+    return n, medias, comomentos
+
+
+def combinar_comomentos(grupos, n, medias, comomentos, minlength=0):
+    """Combina (n, medias, comomentos) de partes en sus grupos (fórmula de Chan, multivariada)."""
+    total = np.bincount(grupos, weights=n, minlength=minlength)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias_total = np.column_stack([
+            np.bincount(grupos, weights=n * col, minlength=minlength) for col in medias.T
+        ]) / total[:, None]
+    desvio = medias - medias_total[grupos]
+    aporte = comomentos + n[:, None, None] * desvio[:, :, None] * desvio[:, None, :]
+    k = medias.shape[1]
+    combinados = np.zeros((len(total), k, k))
+    for i in range(k):
+        for j in range(k):
+            combinados[:, i, j] = np.bincount(grupos, weights=aporte[:, i, j], minlength=minlength)
+    return total, medias_total, combinados
+
+
+def sumar_comomentos(a, b):
+    """Une celda a celda dos (n, medias, comomentos) de las mismas celdas (fórmula de Chan)."""
+    celdas = np.arange(len(a[0]))
+    return combinar_comomentos(
+        np.concatenate([celdas, celdas]), *(np.concatenate(partes) for partes in zip(a, b)), minlength=len(celdas),
+    )
+
+
+def _sumar_celdas(n, medias, comomentos):
+    """(n, medias, comomentos) de todas las celdas juntas."""
+    total = combinar_comomentos(np.zeros(len(n), dtype='int64'), n, medias, comomentos, minlength=1)
+    return tuple(x[0] for x in total)
+
+
+def detectar_colineales(medias, comomentos, tolerancia=TOLERANCIA_COLINEAL):
+    """Columnas independientes y la relación lineal x = A x_independientes + b de todas.
+
+    Cada columna que es combinación exacta de una anterior (|r| = 1 dentro de
+    `tolerancia`) o constante se expresa a partir de las independientes.
+    """
+    k = len(medias)
+    varianza = np.diag(comomentos)
+    independientes, coeficientes, b = [], np.zeros((k, k)), np.zeros(k)
+    for j in range(k):
+        if varianza[j] <= 0:
+            b[j] = medias[j]  # constante: sin varianza no hay correlación
+            continue
+        for i in independientes:
+            r = comomentos[i, j] / np.sqrt(varianza[i] * varianza[j])
+            if 1 - abs(r) <= tolerancia:
+                coeficientes[j, i] = comomentos[i, j] / varianza[i]
+                b[j] = medias[j] - coeficientes[j, i] * medias[i]
+                break
+        else:
+            independientes.append(j)
+            coeficientes[j, j] = 1.0
+    return independientes, coeficientes[:, independientes], b
+
+
+class MotorCorrelacion:
+
+    def __init__(self, claves, columnas, total, n, medias, comomentos):
+        # claves: una fila de DIMENSIONES por celda; total: (n, medias, comomentos) de
+        # todas las `columnas` sobre todas las celdas, de donde salen las columnas
+        # independientes; n, medias y comomentos por celda, solo de las independientes
+        self.claves = claves.reset_index(drop=True)
+        self.columnas = list(columnas)
+        self.total = total
+        self.independientes, self.coeficientes, self.b = detectar_colineales(total[1], total[2])
+        self.n, self.medias, self.comomentos = n, medias, comomentos
+
+    @classmethod
+    def desde_datos(cls, data, columnas=COLUMNAS_NUMERICAS):
+        """Motor de las celdas de `data`, en el mismo orden que cubo.construir_cubo."""
+        grupos = data.groupby(DIMENSIONES, observed=True, sort=True)
+        celda = grupos.ngroup().to_numpy()
+        claves = grupos.size().index.to_frame(index=False)
+        n, medias, comomentos = comomentos_por_grupo(celda, data[columnas].to_numpy(dtype='float64'), len(claves))
+        total = _sumar_celdas(n, medias, comomentos)
+        independientes, _, _ = detectar_colineales(total[1], total[2])
+        return cls(claves, columnas, total, n, medias[:, independientes], comomentos[:, independientes][:, :, independientes])
+
+    def sumar(self, parcial, claves, mapa, mapa_parcial):
+        """Motor sobre las celdas `claves` con los comomentos de `parcial` (otro bloque) sumados a estos.
+
+        `mapa` y `mapa_parcial` son la posición en `claves` de las celdas de cada
+        uno (ver cubo.combinar_cubos). La detección de colineales se repite con
+        el total: una relación que se cumplía hasta ahora puede no cumplirse en
+        el bloque. Si las columnas independientes no cambian, solo se recalculan
+        las celdas que toca `parcial`.
+        """
+        total = _sumar_celdas(*(np.stack([a, b]) for a, b in zip(self.total, parcial.total)))
+        independientes, _, _ = detectar_colineales(total[1], total[2])
+        if independientes == self.independientes:
+            anteriores = self.n, self.medias, self.comomentos
+        else:
+            # Las celdas anteriores cumplen las relaciones anteriores: se reconstruyen con ellas
+            n, medias, comomentos = self.completas()
+            anteriores = n, medias[:, independientes], comomentos[:, independientes][:, :, independientes]
+        k = len(independientes)
+        n, medias, comomentos = np.zeros(len(claves)), np.zeros((len(claves), k)), np.zeros((len(claves), k, k))
+        n[mapa], medias[mapa], comomentos[mapa] = anteriores
+
+        # Solo cambian las celdas que toca `parcial`
+        n_b, medias_b, comomentos_b = parcial.completas()
+        n[mapa_parcial], medias[mapa_parcial], comomentos[mapa_parcial] = sumar_comomentos(
+            (n[mapa_parcial], medias[mapa_parcial], comomentos[mapa_parcial]),
+            (n_b, medias_b[:, independientes], comomentos_b[:, independientes][:, :, independientes]),
+        )
+        return type(self)(claves, self.columnas, total, n, medias, comomentos)
+
+    def completas(self):
+        """(n, medias, comomentos) por celda de todas las columnas, reconstruidas."""
+        medias = self.medias @ self.coeficientes.T + self.b
+        comomentos = self.coeficientes @ self.comomentos @ self.coeficientes.T
+        return self.n, medias, comomentos
+
+    def comomentos_seleccion(self, celdas):
+        """(n, medias, comomentos) de todas las columnas sobre las celdas `celdas`."""
+        grupos = np.zeros(len(celdas), dtype='int64')
+        n, medias, comomentos = combinar_comomentos(
+            grupos, self.n[celdas], self.medias[celdas], self.comomentos[celdas], minlength=1,
+        )
+        return n[0], self.coeficientes @ medias[0] + self.b, self.coeficientes @ comomentos[0] @ self.coeficientes.T
+
+    def correlacion(self, celdas):
+        """Matriz de Pearson de las columnas sobre las celdas `celdas` (como DataFrame.corr)."""
+        _, _, comomentos = self.comomentos_seleccion(celdas)
+        desviacion = np.sqrt(np.diag(comomentos))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlacion = comomentos / np.outer(desviacion, desviacion)
+        return pd.DataFrame(np.clip(correlacion, -1, 1), index=self.columnas, columns=self.columnas)
+
+    def momentos_pareados(self, celdas, x, y):
+        """Momentos (n, Σx, Σy, Σx², Σy², Σxy) de dos columnas, para muestreo.regresion_desde_momentos."""
+        n, medias, comomentos = self.comomentos_seleccion(celdas)
+        i, j = self.columnas.index(x), self.columnas.index(y)
+        return np.array([
+            n, n * medias[i], n * medias[j],
+            comomentos[i, i] + n * medias[i] ** 2,
+            comomentos[j, j] + n * medias[j] ** 2,
+            comomentos[i, j] + n * medias[i] * medias[j],
+        ])
+
+    def colineales(self):
+        """{columna: columna independiente de la que es combinación lineal}."""
+        independientes = [self.columnas[i] for i in self.independientes]
+        return {
+            col: independientes[np.flatnonzero(fila)[0]]
+            for col, fila in zip(self.columnas, self.coeficientes)
+            if col not in independientes and fila.any()
+        }
+
+
+@st.cache_resource(max_entries=2, show_spinner="Preparando correlaciones...")
+def obtener_motor(ruta, version):
+    """Motor compartido entre sesiones para la versión `version` de los datos."""
+    data, _ = leer_version(ruta, version, DIMENSIONES + COLUMNAS_NUMERICAS)
+    return MotorCorrelacion.desde_datos(data)
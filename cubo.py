@@ -0,0 +1,154 @@
+# Cubo de agregación para los indicadores y agrupaciones de las secciones 2 a 4.
+# Se construye una vez por versión de los datos agrupando por todas las
+# dimensiones de los filtros; cada celda guarda el conteo, la suma y la suma de
+# cuadrados de las columnas numéricas. Las vistas del dashboard se obtienen
+# filtrando el cubo (con el mismo motor de bitmaps que los datos) y sumando sus
+# celdas, sin volver a recorrer las filas originales. En el modo por bloques,
+# el cubo de cada bloque se une al acumulado por la clave de sus celdas
+# (combinar_cubos), sin volver a agrupar las celdas ya acumuladas.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS, igualar_categorias, leer_version
+
+DIMENSIONES = ['Date'] + COLUMNAS_CATEGORICAS
+# Extremos por celda: tabla de estadísticas descriptivas (Total) y eje de la recta de 2.5 (cogs)
+COLUMNAS_EXTREMOS = ['Total', 'cogs']
+
+
+def construir_cubo(data, columnas=COLUMNAS_NUMERICAS):
+    """Agrupa `data` por DIMENSIONES con n, suma_<col>, suma2_<col> (y min/max de COLUMNAS_EXTREMOS)."""
+    # Las sumas se acumulan en float64 aunque las columnas se carguen en float32
+    valores = data[columnas].astype('float64')
+    tabla = data[DIMENSIONES].assign(
+        n=1,
+        **{f'suma_{col}': valores[col] for col in columnas},
+        **{f'suma2_{col}': valores[col] ** 2 for col in columnas},
+        **{f'min_{col}': valores[col] for col in COLUMNAS_EXTREMOS},
+        **{f'max_{col}': valores[col] for col in COLUMNAS_EXTREMOS},
+    )
+    return _agrupar(tabla)[0]
+
+
+def _agregacion(col):
+    return 'min' if col.startswith('min_') else 'max' if col.startswith('max_') else 'sum'
+
+
+# Cómo se juntan dos valores de una misma celda (min y max ignoran NaN, como groupby)
+_JUNTAR = {'min': np.fmin, 'max': np.fmax, 'sum': np.add}
+
+
+def _agrupar(tabla):
+    # Devuelve también la celda de cada fila de `tabla`
+    agregaciones = {col: _agregacion(col) for col in tabla.columns if col not in DIMENSIONES}
+    grupos = tabla.groupby(DIMENSIONES, observed=True, sort=True)
+    cubo = grupos.agg(agregaciones).reset_index()
+    cubo['n'] = cubo['n'].astype('int64')
+    return cubo, grupos.ngroup().to_numpy()
+
+
+def _codigos(claves, columnas):
+    """Un entero por fila de `claves` que se ordena como las filas por `columnas`.
+
+    Las columnas son categóricas (se ordenan por código), salvo quizá la
+    primera, de fechas (se ordena por día).
+    """
+    codigo = np.zeros(len(claves), dtype='int64')
+    for col in columnas:
+        columna = claves[col]
+        if isinstance(columna.dtype, pd.CategoricalDtype):
+            codigo = codigo * len(columna.cat.categories) + columna.cat.codes.to_numpy()
+        else:
+            codigo = columna.to_numpy().astype('datetime64[D]').astype('int64')
+    return codigo
+
+
+def unir_codigos(codigos, codigos_parcial):
+    """Posiciones de dos conjuntos de códigos en su unión ordenada.
+
+    `codigos` está ordenado y `codigos_parcial` no tiene repetidos (en cualquier
+    orden). Devuelve (posición en la unión de cada uno de `codigos`, de cada uno
+    de `codigos_parcial`, índice en `codigos` de cada uno de `codigos_parcial` o
+    -1 si es nuevo, largo de la unión). Solo se ordenan los códigos nuevos.
+    """
+    posicion = np.searchsorted(codigos, codigos_parcial)
+    encontrado = posicion < len(codigos)
+    encontrado[encontrado] = codigos[posicion[encontrado]] == codigos_parcial[encontrado]
+    previa = np.where(encontrado, posicion, -1)
+    nuevos = np.sort(codigos_parcial[~encontrado])
+    # Cada código se corre tantos lugares como códigos nuevos menores que él hay
+    mapa = np.arange(len(codigos)) + np.searchsorted(nuevos, codigos)
+    mapa_parcial = posicion + np.searchsorted(nuevos, codigos_parcial)
+    return mapa, mapa_parcial, previa, len(codigos) + len(nuevos)
+
+
+def unir_claves(claves, claves_parcial, columnas=DIMENSIONES):
+    """unir_codigos de las filas de dos tablas de claves (sin filas repetidas en cada una).
+
+    `claves` está ordenada por `columnas` y las dos tienen las mismas
+    categorías (ver carga_datos.igualar_categorias).
+    """
+    return unir_codigos(_codigos(claves, columnas), _codigos(claves_parcial, columnas))
+
+
+def _colocar(columna, columna_parcial, mapa, mapa_parcial, largo):
+    if isinstance(columna.dtype, pd.CategoricalDtype):
+        codigos = _colocar(columna.cat.codes, columna_parcial.cat.codes, mapa, mapa_parcial, largo)
+        return pd.Categorical.from_codes(codigos, dtype=columna.dtype)
+    valores = np.empty(largo, dtype=columna.dtype)
+    valores[mapa], valores[mapa_parcial] = columna.to_numpy(), columna_parcial.to_numpy()
+    return valores
+
+
+def colocar_filas(tabla, tabla_parcial, mapa, mapa_parcial, largo):
+    """Tabla de `largo` filas con las de `tabla` en `mapa` y las de `tabla_parcial` en `mapa_parcial`.
+
+    En las posiciones que están en los dos quedan las filas de `tabla_parcial`.
+    """
+    return pd.DataFrame({col: _colocar(tabla[col], tabla_parcial[col], mapa, mapa_parcial, largo) for col in tabla.columns})
+
+
+def combinar_cubos(cubo, parcial):
+    """Une al cubo acumulado `cubo` un cubo parcial (por ejemplo, el de un bloque siguiente del archivo).
+
+    Las celdas de `parcial` que ya están en `cubo` se juntan con las suyas y
+    las nuevas se intercalan en orden; no se reagrupa el cubo, solo se copia.
+    Devuelve el cubo y la posición en él de las celdas de `cubo` y de `parcial`.
+    """
+    cubo, parcial = igualar_categorias([cubo, parcial])
+    mapa, mapa_parcial, previa, largo = unir_claves(cubo, parcial)
+    columnas = {col: _colocar(cubo[col], parcial[col], mapa, mapa_parcial, largo) for col in cubo.columns}
+    comunes = previa >= 0
+    destino, origen = mapa_parcial[comunes], previa[comunes]
+    for col in cubo.columns.difference(DIMENSIONES):
+        columnas[col][destino] = _JUNTAR[_agregacion(col)](cubo[col].to_numpy()[origen], parcial[col].to_numpy()[comunes])
+    return pd.DataFrame(columnas), mapa, mapa_parcial
+
+
+@st.cache_resource(max_entries=2, show_spinner="Preparando agregados...")
+def obtener_cubo(ruta, version):
+    """Cubo compartido entre sesiones para la versión `version` de los datos."""
+    data, _ = leer_version(ruta, version, DIMENSIONES + COLUMNAS_NUMERICAS)
+    return construir_cubo(data)
+
+
+def indicadores(cubo):
+    """(ventas totales, ingreso bruto, transacciones) de las celdas de `cubo`."""
+    return cubo['suma_Total'].sum(), cubo['suma_gross income'].sum(), int(cubo['n'].sum())
+
+
+def sumar_por(cubo, por, columna='Total'):
+    """Suma de `columna` agrupada por `por` (una dimensión o una lista de dimensiones)."""
+    return cubo.groupby(por, observed=True)[f'suma_{columna}'].sum().rename(columna)
+
+
+def contar_por(cubo, por):
+    return cubo.groupby(por, observed=True)['n'].sum()
+
+
+def extremos_por(cubo, por, columna='Total'):
+    """Mínimo y máximo de `columna` por grupo (solo para COLUMNAS_EXTREMOS)."""
+    grupos = cubo.groupby(por, observed=True)
+    return grupos.agg(min=(f'min_{columna}', 'min'), max=(f'max_{columna}', 'max'))
@@ -1,52 +1,140 @@
 # --- CÓDIGO PARA dashboard_tarea_grupo_39.py ---
 # (Este bloque NO se ejecuta directamente en Jupyter)
 
+import functools
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from mpl_toolkits.mplot3d import Axes3D
+
+import graficos
+from cache_figuras import mostrar_estadisticas, obtener_cache_figuras
+from carga_datos import cargar_datos, mostrar_info_carga
+from correlacion import obtener_motor
+from filtros import obtener_indice
+from incremental import huella_seleccion, obtener_vistas
+from memoria import mostrar_memoria
+from cubo import contar_por, extremos_por, indicadores, obtener_cubo, sumar_por
+from en_vivo import obtener_seguidor, ruta_en_vivo, vigilar
+from estadisticas import ANCHO_BARRA_RATING, obtener_resumenes
+from muestreo import PRESUPUESTO_PUNTOS, etiqueta_muestra, muestra_estratificada, regresion_desde_momentos
+from perfilado import ACTIVO_POR_DEFECTO, Perfilador, mostrar_perfilado
+from por_bloques import cargar_por_bloques, usar_modo_bloques
+from render_paralelo import PaginaGraficos, obtener_renderizador
+from series_tiempo import RESOLUCIONES, elegir_resolucion, obtener_series
 
 # Configuración inicial
 st.set_page_config(page_title="Dashboard Grupo 39", layout="wide")
 st.title("Dashboard Interactivo - Grupo 39")
 
-# Cargar datos
-data = pd.read_csv('data.csv')
-data['Date'] = pd.to_datetime(data['Date'], format='%m/%d/%Y')
+# Columnas que usa cada sección, además de las de filtros e indicadores
+COLUMNAS_SECCION = {
+    "1. Selección de Variables Clave": [],
+    "2. Análisis Gráfico de las Ventas": ['cogs'],
+    "3. Gráficos Compuestos": [],
+    "4. Visualización 3D": ['Unit price', 'Quantity', 'Rating'],
+}
 
 st.sidebar.info("Grupo 39 | Proyecto Final")
 st.sidebar.markdown("---")
-section = st.sidebar.radio("Ir a la sección:", [
-    "1. Selección de Variables Clave",
-    "2. Análisis Gráfico de las Ventas",
-    "3. Gráficos Compuestos",
-    "4. Visualización 3D"
-])
+section = st.sidebar.radio("Ir a la sección:", list(COLUMNAS_SECCION))
+# Tiempos, memoria y filas de cada etapa de la ejecución (ver perfilado.py)
+perfilador = Perfilador(st.sidebar.toggle("Perfilado", value=ACTIVO_POR_DEFECTO), seccion=section)
+
+# Cargar datos (en caché mientras data.csv no cambie). Si el archivo no cabe en memoria
+# se recorre por bloques: el cubo sale del archivo completo y las vistas por factura
+# usan una muestra uniforme. En modo en vivo (G39_EN_VIVO) se suman a esos agregados solo
+# las filas que se van añadiendo al archivo
+with perfilador.etapa('carga') as etapa:
+    seguido = ruta_en_vivo('data.csv')
+    modo_bloques = seguido is not None or usar_modo_bloques('data.csv')
+    if modo_bloques:
+        if seguido is not None:
+            seguidor = obtener_seguidor(seguido)
+            agregados, info_carga = seguidor.refrescar()
+            vigilar(seguidor)
+            st.sidebar.caption(f"Modo en vivo: {info_carga['nuevas']:,} filas nuevas en la última actualización")
+        else:
+            agregados, info_carga = cargar_por_bloques('data.csv')
+        if agregados.cubo is None:
+            # Archivo vacío, solo con la cabecera o recién truncado: no hay nada que mostrar
+            # hasta que lleguen filas (en modo en vivo, vigilar vuelve a ejecutar el script)
+            mostrar_info_carga(info_carga)
+            st.info("Todavía no hay facturas en los datos.")
+            st.stop()
+        data, cubo, series, resumenes = agregados.muestra, agregados.cubo, agregados.series, agregados.resumenes
+        motor = agregados.motor
+        st.sidebar.caption(f"Modo por bloques: vistas por factura sobre una muestra de {len(data):,} filas")
+    else:
+        # Solo con las columnas de la sección
+        data, info_carga = cargar_datos('data.csv', columnas=COLUMNAS_SECCION[section])
+        cubo = obtener_cubo('data.csv', info_carga['version'])
+        series = obtener_series('data.csv', info_carga['version'])
+        resumenes = obtener_resumenes('data.csv', info_carga['version'])
+        motor = obtener_motor('data.csv', info_carga['version'])
+    etapa['filas'] = len(data)
+mostrar_info_carga(info_carga)
 
 # Sidebar con filtros
 st.sidebar.title("Filtros de Segmentación")
 
-min_date = data["Date"].min()
-max_date = data["Date"].max()
+min_date = cubo["Date"].min()
+max_date = cubo["Date"].max()
 date_range = st.sidebar.date_input("Rango de Fechas", [min_date, max_date], min_value=min_date, max_value=max_date)
-cities = st.sidebar.multiselect("Ciudad (City)", options=data["City"].unique(), default=data["City"].unique())
-genders = st.sidebar.multiselect("Género (Gender)", options=data["Gender"].unique(), default=data["Gender"].unique())
-types = st.sidebar.multiselect("Tipo de Cliente (Customer type)", options=data["Customer type"].unique(), default=data["Customer type"].unique())
-products = st.sidebar.multiselect("Línea de Producto (Product line)", options=data["Product line"].unique(), default=data["Product line"].unique())
-payments = st.sidebar.multiselect("Método de Pago (Payment)", options=data["Payment"].unique(), default=data["Payment"].unique())
-branches = st.sidebar.multiselect("Sucursal (Branch)", options=data["Branch"].unique(), default=data["Branch"].unique())
-
-filtered_data = data[
-    (data["Date"] >= pd.to_datetime(date_range[0])) &
-    (data["Date"] <= pd.to_datetime(date_range[1])) &
-    (data["City"].isin(cities)) &
-    (data["Gender"].isin(genders)) &
-    (data["Customer type"].isin(types)) &
-    (data["Product line"].isin(products)) &
-    (data["Payment"].isin(payments)) &
-    (data["Branch"].isin(branches))
-]
+cities = st.sidebar.multiselect("Ciudad (City)", options=cubo["City"].unique(), default=cubo["City"].unique())
+genders = st.sidebar.multiselect("Género (Gender)", options=cubo["Gender"].unique(), default=cubo["Gender"].unique())
+types = st.sidebar.multiselect("Tipo de Cliente (Customer type)", options=cubo["Customer type"].unique(), default=cubo["Customer type"].unique())
+products = st.sidebar.multiselect("Línea de Producto (Product line)", options=cubo["Product line"].unique(), default=cubo["Product line"].unique())
+payments = st.sidebar.multiselect("Método de Pago (Payment)", options=cubo["Payment"].unique(), default=cubo["Payment"].unique())
+branches = st.sidebar.multiselect("Sucursal (Branch)", options=cubo["Branch"].unique(), default=cubo["Branch"].unique())
+
+# Filtrado con bitmaps precalculados por valor y búsqueda binaria del rango de fechas
+selecciones = {
+    "City": cities,
+    "Gender": genders,
+    "Customer type": types,
+    "Product line": products,
+    "Payment": payments,
+    "Branch": branches,
+}
+with perfilador.etapa('filtros') as etapa:
+    indice = obtener_indice(data, info_carga['clave'])
+    # La sesión guarda solo las posiciones de las filas filtradas; `data` es compartido
+    filtered_data = indice.vista(data, selecciones, date_range)
+    etapa['filas'] = len(filtered_data)
+
+# Celdas del cubo de agregados (fecha x dimensiones de filtro) con la misma selección.
+# Las vistas agregadas de la sesión solo suman las celdas que entran y restan las que
+# salen respecto de la ejecución anterior
+clave_cubo = (info_carga['version'], 'cubo', modo_bloques)
+with perfilador.etapa('cubo') as etapa:
+    celdas = obtener_indice(cubo, clave_cubo).indices(selecciones, date_range)
+    vistas = obtener_vistas(cubo, clave_cubo, celdas)
+    ventas_totales, ingreso_bruto, transacciones = indicadores(vistas.vista('total'))
+    etapa['filas'] = len(celdas)
+
+# Caché de figuras: cada gráfico se redibuja solo si cambian las celdas seleccionadas
+# (un cambio de filtros que deja las mismas filas no redibuja nada) o los datos, y los
+# que hay que redibujar se renderizan en paralelo en un pool de procesos
+cache_figuras = obtener_cache_figuras()
+clave_seleccion = (huella_seleccion(celdas), info_carga['clave'])
+pagina = PaginaGraficos(cache_figuras, obtener_renderizador(), clave_seleccion, perfilador)
+
+# Subsecciones desplegadas al entrar por primera vez en la sección 2
+VISIBLES_POR_DEFECTO = {'2.1'}
+
+
+def visible(id_grafico):
+    return st.session_state.get(f"mostrar_{id_grafico}", id_grafico in VISIBLES_POR_DEFECTO)
+
+
+@st.fragment
+def subseccion(titulo, id_grafico, contenido):
+    # Cada subsección calcula y dibuja su contenido solo cuando está desplegada;
+    # desplegarla re-ejecuta únicamente este fragmento, no el script completo
+    st.markdown(titulo)
+    if st.toggle("Mostrar", value=id_grafico in VISIBLES_POR_DEFECTO, key=f"mostrar_{id_grafico}"):
+        with perfilador.etapa(f"{id_grafico} subsección"):
+            contenido()
+
 
 if section == "1. Selección de Variables Clave":
     st.subheader("1. Selección de Variables Clave")
@@ -73,162 +161,164 @@ elif section == "2. Análisis Gráfico de las Ventas":
 
     # Indicadores Ventas Total, Ingreso Bruto, Transacciones
     col1, col2, col3 = st.columns(3)
-    col1.metric("Ventas Totales", f"${filtered_data['Total'].sum():,.2f}")
-    col2.metric("Ingreso Bruto", f"${filtered_data['gross income'].sum():,.2f}")
-    col3.metric("Transacciones", f"{len(filtered_data)}")
+    col1.metric("Ventas Totales", f"${ventas_totales:,.2f}")
+    col2.metric("Ingreso Bruto", f"${ingreso_bruto:,.2f}")
+    col3.metric("Transacciones", f"{transacciones}")
 
     
     st.subheader("2. Análisis Gráfico de las Ventas")
 
-    st.markdown("### 2.1 📈 Evolución de las Ventas Totales")
-    ventas_diarias = filtered_data.groupby('Date')['Total'].sum()
-    fig, ax = plt.subplots(figsize=(14, 7))
-    ventas_diarias.plot(kind='line', marker='o', ax=ax)
-    ax.set_title('Ventas Diarias Totales')
-    ax.set_xlabel('Fecha')
-    ax.set_ylabel('Ventas Totales')
-    ax.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(fig)
-
-    st.markdown("### 2.2 📊 Ingresos por Línea de Productos")
-    ventas_por_producto = filtered_data.groupby('Product line')['Total'].sum().reset_index().sort_values(by='Total', ascending=False)
-    fig2, ax2 = plt.subplots(figsize=(14, 7))
-    sns.barplot(data=ventas_por_producto, x='Total', y='Product line', color='steelblue', ax=ax2)
-    ax2.set_title('Ventas Totales por Línea de Producto')
-    ax2.set_xlabel('Total Ventas')
-    ax2.set_ylabel('Línea de Producto')
-    ax2.grid(axis='x', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    st.pyplot(fig2)
-
-    st.markdown("### 2.3 ⭐ Distribución de la Calificación de Clientes")
-    fig3, ax3 = plt.subplots(figsize=(14, 7))
-    sns.histplot(data=filtered_data, x='Rating', bins=40, kde=True, color='steelblue', edgecolor='black', ax=ax3)
-    ax3.set_title('Distribución de la Calificación del Cliente')
-    ax3.set_xlabel('Rating')
-    ax3.set_ylabel('Frecuencia')
-    st.pyplot(fig3)
-
-    st.markdown("### 2.4 📦 Comparación del Gasto por Tipo de Cliente")
-    custom_palette = {'Member': 'steelblue', 'Normal': '#F4A7B9'}
-    fig4, ax4 = plt.subplots(figsize=(14, 7))
-    sns.boxplot(data=filtered_data, x='Customer type', y='Total', hue='Customer type', palette=custom_palette, ax=ax4)
-    ax4.set_title('Distribución del Gasto por Tipo de Cliente')
-    st.pyplot(fig4)
-
-    st.markdown("#### 📊 Estadísticas Descriptivas por Tipo de Cliente")
-    stats = filtered_data.groupby('Customer type')['Total'].describe()[['mean', '50%', 'std', 'min', '25%', '75%', 'max']].rename(columns={
-        'mean': 'Media', '50%': 'Mediana', 'std': 'Desviación estándar',
-        'min': 'Mínimo', '25%': 'Q1', '75%': 'Q3', 'max': 'Máximo'
-    })
-    st.dataframe(stats.style.format("{:.2f}"), use_container_width=True)
-
-    st.markdown("### 2.5 📈 Relación entre Costo y Ganancia Bruta")
-    fig5, ax5 = plt.subplots(figsize=(14, 7))
-    sns.scatterplot(data=filtered_data, x='cogs', y='gross income', alpha=0.6, color='steelblue', ax=ax5)
-    sns.regplot(data=filtered_data, x='cogs', y='gross income', scatter=False, color='darkred', ax=ax5)
-    ax5.set_title('Relación Costo de Bienes y Ganancia Bruta')
-    st.pyplot(fig5)
-    correlacion = filtered_data[['cogs', 'gross income']].corr().iloc[0,1]
-    st.markdown(f"#### 🔗 Coeficiente de correlación (Pearson): `{correlacion:.2f}`")
-
-    st.markdown("### 2.6 💳 Métodos de Pago Preferidos")
-    custom_palette = {'Credit card': 'steelblue', 'Cash': '#F4A7B9', 'Ewallet': '#FFD580'}
-    fig6, ax6 = plt.subplots(figsize=(14, 7))
-    sns.countplot(data=filtered_data, x='Payment', hue='Payment', palette=custom_palette, legend=False, ax=ax6)
-    ax6.set_title('Métodos de Pago Preferidos')
-    for p in ax6.patches:
-        height = p.get_height()
-        ax6.annotate(f'{int(height)}', (p.get_x() + p.get_width()/2., height/2),
-                     ha='center', va='center', color='white', fontsize=12, fontweight='bold')
-    st.pyplot(fig6)
-
-    st.markdown("### 2.7 🔍 Análisis de Correlación Numérica")
-    variables_numericas = ['Unit price', 'Quantity', 'Tax 5%', 'Total', 'cogs', 'gross income', 'Rating']
-    correlation_matrix = filtered_data[variables_numericas].corr()
-    fig7, ax7 = plt.subplots(figsize=(14, 7))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5, ax=ax7)
-    ax7.set_title('Matriz de Correlación entre Variables Numéricas')
-    st.pyplot(fig7)
-
-    st.markdown("### 2.8 🏪 Ingreso Bruto por Sucursal y Línea de Producto")
-    df_grouped = filtered_data.groupby(['Branch', 'Product line'])['gross income'].sum().unstack()
-    fig8, ax8 = plt.subplots(figsize=(14, 7))
-    df_grouped.plot(kind='bar', stacked=True, ax=ax8, colormap='Set3')
-    ax8.set_title('Composición del Ingreso Bruto por Sucursal y Línea de Producto', fontsize=14)
-    ax8.set_xlabel('Sucursal (Branch)')
-    ax8.set_ylabel('Ingreso Bruto Total')
-    ax8.legend(title='Línea de Producto', bbox_to_anchor=(1.05, 1), loc='upper left')
-    for idx, branch in enumerate(df_grouped.index):
-        y_offset = 0
-        for product in df_grouped.columns:
-            value = df_grouped.loc[branch, product]
-            if value > 0:
-                ax8.text(
-                    idx,                          # x
-                    y_offset + value / 2,         # y
-                    f'{value:.0f}',               # texto
-                    ha='center', va='center', fontsize=8
-                )
-                y_offset += value
-    
-    plt.tight_layout()
-    st.pyplot(fig8)
-
-    ingresos_por_sucursal = (
-        filtered_data.groupby('Branch')['gross income']
-        .sum().round(2).reset_index()
-        .rename(columns={'Branch': 'Sucursal', 'gross income': 'Ingreso Bruto Total'})
-        .sort_values(by='Ingreso Bruto Total', ascending=False)
-        .reset_index(drop=True)
-    )
-    st.markdown("#### 📋 Ingreso Bruto Total por Sucursal")
-    st.dataframe(ingresos_por_sucursal, use_container_width=True)
+    # Cada gráfico con la preparación de sus datos; solo se calcula si hay que dibujarlo
+    # Ventas en el tiempo desde las series preagregadas, por día, semana o mes según
+    # la longitud del rango de fechas
+    dia_inicio, dia_fin = series.tramo(date_range)
+    resolucion = elegir_resolucion(dia_fin - dia_inicio)
+    rango_serie = (series.dias[dia_inicio], series.dias[dia_fin - 1]) if dia_fin > dia_inicio else None
+    pagina.registrar('2.1', graficos.ventas_por_periodo, lambda: (
+        series.serie(selecciones, date_range, resolucion)[0],
+    ), resolucion=resolucion, rango=rango_serie)
+    pagina.registrar('2.2', graficos.ventas_por_producto, lambda: (
+        sumar_por(vistas.vista('Product line'), 'Product line').reset_index().sort_values(by='Total', ascending=False),
+    ))
+    # Histograma desde los conteos por barra de las celdas seleccionadas
+    pagina.registrar('2.3', graficos.distribucion_rating, lambda: (
+        resumenes.histograma(celdas),
+    ), ancho_barra=ANCHO_BARRA_RATING)
+    pagina.registrar('2.4', graficos.gasto_por_tipo_cliente, lambda: (filtered_data[['Customer type', 'Total']],))
+
+    # Regresión y Pearson de los comomentos de las celdas seleccionadas (todas las filas
+    # filtradas); en el gráfico, como mucho PRESUPUESTO_PUNTOS puntos de una muestra estratificada
+    @functools.cache
+    def regresion_costo():
+        seleccion = cubo.iloc[celdas]
+        return regresion_desde_momentos(
+            motor.momentos_pareados(celdas, 'cogs', 'gross income'),
+            seleccion['min_cogs'].min(), seleccion['max_cogs'].max(),
+        )
+
+    pagina.registrar('2.5', graficos.costo_vs_ganancia, lambda: (
+        muestra_estratificada(filtered_data)[['cogs', 'gross income', 'Product line']], regresion_costo(),
+    ))
+    pagina.registrar('2.6', graficos.metodos_pago, lambda: (
+        contar_por(vistas.vista('Payment'), 'Payment').rename('count').reset_index(),
+    ))
+    pagina.registrar('2.7', graficos.matriz_correlacion, lambda: (
+        motor.correlacion(celdas),
+    ))
+    pagina.registrar('2.8', graficos.ingreso_sucursal_producto, lambda: (
+        sumar_por(vistas.vista('Branch x Product line'), ['Branch', 'Product line'], 'gross income').unstack(),
+    ))
+    pagina.registrar('2.9', graficos.ventas_por_hora, lambda: (series.por_hora(selecciones, date_range),))
+
+    # Los gráficos visibles que no están en caché se renderizan a la vez en el pool
+    with perfilador.etapa('envío al pool'):
+        pagina.adelantar([id_grafico for id_grafico in pagina.especificaciones if visible(id_grafico)])
+
+    def evolucion_ventas():
+        pagina.mostrar('2.1')
+        st.caption(f"Un punto por {RESOLUCIONES[resolucion][0]}, según la longitud del rango de fechas.")
+
+    subseccion("### 2.1 📈 Evolución de las Ventas Totales", '2.1', evolucion_ventas)
+
+    subseccion("### 2.2 📊 Ingresos por Línea de Productos", '2.2', lambda: pagina.mostrar('2.2'))
+
+    subseccion("### 2.3 ⭐ Distribución de la Calificación de Clientes", '2.3', lambda: pagina.mostrar('2.3'))
+
+    def gasto_por_tipo_cliente():
+        pagina.mostrar('2.4')
+
+        st.markdown("#### 📊 Estadísticas Descriptivas por Tipo de Cliente")
+        # Media y desviación salen de los resúmenes por celda y los cuartiles, de los de cada
+        # combinación y mes (ver estadisticas.py); mínimo y máximo, del cubo
+        extremos = extremos_por(cubo.iloc[celdas], 'Customer type')
+        stats = resumenes.describir_por(celdas, 'Customer type').join(extremos)[['mean', '50%', 'std', 'min', '25%', '75%', 'max']].rename(columns={
+            'mean': 'Media', '50%': 'Mediana', 'std': 'Desviación estándar',
+            'min': 'Mínimo', '25%': 'Q1', '75%': 'Q3', 'max': 'Máximo'
+        })
+        st.dataframe(stats.style.format("{:.2f}"), use_container_width=True)
+
+    subseccion("### 2.4 📦 Comparación del Gasto por Tipo de Cliente", '2.4', gasto_por_tipo_cliente)
+
+    def costo_vs_ganancia():
+        pagina.mostrar('2.5')
+        etiqueta = etiqueta_muestra(min(PRESUPUESTO_PUNTOS, len(filtered_data)), transacciones)
+        if etiqueta:
+            st.caption(etiqueta + " La recta y la correlación se calculan con todos los datos.")
+        correlacion = regresion_costo()['pearson']
+        st.markdown(f"#### 🔗 Coeficiente de correlación (Pearson): `{correlacion:.2f}`")
+
+    subseccion("### 2.5 📈 Relación entre Costo y Ganancia Bruta", '2.5', costo_vs_ganancia)
+
+    subseccion("### 2.6 💳 Métodos de Pago Preferidos", '2.6', lambda: pagina.mostrar('2.6'))
+
+    def correlacion_numerica():
+        pagina.mostrar('2.7')
+        colineales = motor.colineales()
+        if colineales:
+            st.caption("Columnas que son combinación lineal exacta de otra (correlación ±1), calculadas a partir de ella: "
+                       + ", ".join(f"{col} ← {base}" for col, base in colineales.items()) + ".")
+
+    subseccion("### 2.7 🔍 Análisis de Correlación Numérica", '2.7', correlacion_numerica)
+
+    def ingreso_sucursal_producto():
+        pagina.mostrar('2.8')
+
+        ingresos_por_sucursal = (
+            sumar_por(vistas.vista('Branch'), 'Branch', 'gross income')
+            .round(2).reset_index()
+            .rename(columns={'Branch': 'Sucursal', 'gross income': 'Ingreso Bruto Total'})
+            .sort_values(by='Ingreso Bruto Total', ascending=False)
+            .reset_index(drop=True)
+        )
+        st.markdown("#### 📋 Ingreso Bruto Total por Sucursal")
+        st.dataframe(ingresos_por_sucursal, use_container_width=True)
+
+    subseccion("### 2.8 🏪 Ingreso Bruto por Sucursal y Línea de Producto", '2.8', ingreso_sucursal_producto)
+
+    subseccion("### 2.9 🕒 Ventas por Hora del Día", '2.9', lambda: pagina.mostrar('2.9'))
+
+    # Los gráficos del pool llenan su lugar en el orden en que terminan
+    pagina.completar()
 
 elif section == "3. Gráficos Compuestos":
 
     # Indicadores Ventas Total, Ingreso Bruto, Transacciones
     col1, col2, col3 = st.columns(3)
-    col1.metric("Ventas Totales", f"${filtered_data['Total'].sum():,.2f}")
-    col2.metric("Ingreso Bruto", f"${filtered_data['gross income'].sum():,.2f}")
-    col3.metric("Transacciones", f"{len(filtered_data)}")
+    col1.metric("Ventas Totales", f"${ventas_totales:,.2f}")
+    col2.metric("Ingreso Bruto", f"${ingreso_bruto:,.2f}")
+    col3.metric("Transacciones", f"{transacciones}")
     
     st.subheader("3. Gráficos Compuestos")
     st.markdown("### 3.1 Distribución del Total de Compras según Género y Tipo de Cliente")
-    g = sns.FacetGrid(filtered_data, col="Gender", row="Customer type", margin_titles=True, height=4)
-    g.map(sns.histplot, "Total", bins=20, kde=True)
-    g.fig.subplots_adjust(top=0.9)
-    g.fig.suptitle("Distribución del Total de Compras según Género y Tipo de Cliente")
-    st.pyplot(g.fig)
+    pagina.registrar('3.1', graficos.total_por_genero_y_tipo, lambda: (filtered_data[['Gender', 'Customer type', 'Total']],))
+    pagina.mostrar('3.1')
 
 elif section == "4. Visualización 3D":
 
     # Indicadores Ventas Total, Ingreso Bruto, Transacciones
     col1, col2, col3 = st.columns(3)
-    col1.metric("Ventas Totales", f"${filtered_data['Total'].sum():,.2f}")
-    col2.metric("Ingreso Bruto", f"${filtered_data['gross income'].sum():,.2f}")
-    col3.metric("Transacciones", f"{len(filtered_data)}")
+    col1.metric("Ventas Totales", f"${ventas_totales:,.2f}")
+    col2.metric("Ingreso Bruto", f"${ingreso_bruto:,.2f}")
+    col3.metric("Transacciones", f"{transacciones}")
     
     st.subheader("4. Visualización en 3D")
     st.markdown("### 4.1 Visualización 3D: Unit Price vs Quantity vs Rating")
+    pagina.registrar('4.1', graficos.dispersion_3d, lambda: (
+        muestra_estratificada(filtered_data)[['Unit price', 'Quantity', 'Rating', 'Product line']],
+    ))
+    pagina.mostrar('4.1')
+    etiqueta = etiqueta_muestra(min(PRESUPUESTO_PUNTOS, len(filtered_data)), transacciones)
+    if etiqueta:
+        st.caption(etiqueta)
 
-    fig = plt.figure(figsize=(14, 7))
-    ax = fig.add_subplot(111, projection='3d')
-
-    x = filtered_data['Unit price']
-    y = filtered_data['Quantity']
-    z = filtered_data['Rating']
-
-    sc = ax.scatter(x, y, z, c=z, cmap='viridis', alpha=0.8)
-    ax.set_xlabel('Unit Price')
-    ax.set_ylabel('Quantity')
-    ax.set_zlabel('Rating')
-    ax.set_title('Visualización 3D: Unit Price vs Quantity vs Rating')
-
-    cbar = plt.colorbar(sc, ax=ax, shrink=0.5)
-    cbar.set_label('Rating')
-
-    plt.tight_layout()
-    st.pyplot(fig)
+# Al final del script, para que incluya los gráficos de esta ejecución
+mostrar_estadisticas(cache_figuras)
+mostrar_memoria(
+    {
+        'datos': data, 'cubo': cubo, 'series': series, 'resúmenes': resumenes, 'correlaciones': motor,
+        'índice de filas': indice, 'índice de celdas': obtener_indice(cubo, clave_cubo),
+    },
+    (filtered_data, celdas, st.session_state.to_dict()),
+    {'caché de gráficos': cache_figuras.bytes},
+)
+mostrar_perfilado(perfilador.terminar())
@@ -0,0 +1,253 @@
+# Modo en vivo: el punto de venta va añadiendo facturas a data.csv (o deja
+# archivos CSV nuevos en un directorio) mientras el dashboard está abierto.
+# En lugar de volver a leer todo el archivo cuando cambia, se guarda hasta qué
+# byte se leyó cada archivo y en cada actualización se interpretan solo las
+# filas completas añadidas después. Las facturas repetidas (mismo Invoice ID)
+# se descartan y las nuevas se suman a los agregados del modo por bloques: solo
+# se recalculan las celdas, franjas y series que tocan las filas nuevas, y lo
+# demás se copia a su nueva posición (los agregados anteriores pueden seguir en
+# uso). El costo de una actualización es el de las filas nuevas más copiar los
+# agregados, que crecen con los días y combinaciones, no con el total de filas.
+# Si el archivo se reemplaza por otro (rotación), el nuevo se lee desde el
+# principio y se conservan las filas ya sumadas; si se reescribe en el mismo
+# lugar (truncado), los agregados se reconstruyen desde cero.
+
+import copy
+import hashlib
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import TIPOS_COLUMNAS, preparar_tipos
+from por_bloques import TAM_MUESTRA, AgregadosPorBloques
+
+# Bytes leídos por vez: acota la memoria de la primera lectura de un archivo grande
+BYTES_POR_LECTURA = 64 * 2**20
+# Bytes del inicio del archivo que se comparan para detectar que se reescribió
+BYTES_HUELLA = 4096
+# Una última fila sin salto de línea se da por completa si el archivo no cambió en este tiempo
+ASENTAMIENTO_S = 2.0
+# Cada cuántos segundos se comprueba si llegaron filas nuevas
+INTERVALO_S = float(os.environ.get('G39_INTERVALO_VIVO', 5))
+
+
+def ruta_en_vivo(ruta):
+    """Ruta a seguir en modo en vivo, o None si no está activo.
+
+    G39_EN_VIVO=1 sigue `ruta`; cualquier otro valor es la ruta de un archivo o
+    de un directorio de archivos CSV a seguir.
+    """
+    valor = os.environ.get('G39_EN_VIVO')
+    if not valor or valor == '0':
+        return None
+    return ruta if valor == '1' else valor
+
+
+def _asentado(info):
+    return time.time() - info.st_mtime >= ASENTAMIENTO_S
+
+
+def _resumen(datos):
+    return hashlib.blake2b(datos, digest_size=16).digest()
+
+
+def _huella(ruta, n):
+    with open(ruta, 'rb') as f:
+        return _resumen(f.read(n))
+
+
+class ClavesVistas:
+    """Conjunto de hashes de 64 bits guardado en tramos ordenados de tamaño decreciente.
+
+    Cada inserción crea un tramo y lo une con los últimos mientras no sean más
+    grandes que él: en total cada clave se copia unas log2(n) veces, en lugar
+    de copiar todo el conjunto en cada inserción.
+    """
+
+    def __init__(self):
+        self.tramos = []
+
+    def contiene(self, claves):
+        vista = np.zeros(len(claves), dtype=bool)
+        for tramo in self.tramos:
+            posicion = np.minimum(np.searchsorted(tramo, claves), len(tramo) - 1)
+            vista |= tramo[posicion] == claves
+        return vista
+
+    def agregar(self, claves):
+        if len(claves) == 0:
+            return
+        tramo = np.sort(claves)
+        while self.tramos and len(self.tramos[-1]) <= len(tramo):
+            # Unir dos tramos ordenados con un orden estable (timsort) es lineal
+            tramo = np.sort(np.concatenate([self.tramos.pop(), tramo]), kind='stable')
+        self.tramos.append(tramo)
+
+
+class ArchivoSeguido:
+    """Posición de lectura de un CSV que crece por el final."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.inodo = None
+        self.posicion = 0
+        # Tamaño del archivo en la última lectura (puede terminar en una fila a medio escribir)
+        self.tamano = 0
+        self.cabecera = b''
+        # (bytes, resumen) del inicio del archivo ya leído
+        self.huella = (0, _resumen(b''))
+
+    def estado(self):
+        """'igual', 'crecio', 'rotado' (hay otro archivo en la ruta) o 'truncado' (se reescribió)."""
+        try:
+            info = os.stat(self.ruta)
+        except FileNotFoundError:
+            return 'igual'  # entre la rotación y la creación del archivo nuevo
+        if self.inodo is None:
+            return 'crecio' if info.st_size > 0 else 'igual'
+        if info.st_ino != self.inodo:
+            return 'rotado'
+        if info.st_size < self.posicion or _huella(self.ruta, self.huella[0]) != self.huella[1]:
+            return 'truncado'
+        if info.st_size > self.tamano or (info.st_size > self.posicion and _asentado(info)):
+            return 'crecio'
+        return 'igual'
+
+    def leer_nuevas(self):
+        """Itera, como DataFrames, las filas completas añadidas desde la última lectura."""
+        with open(self.ruta, 'rb') as f:
+            info = os.fstat(f.fileno())
+            self.inodo, self.tamano = info.st_ino, info.st_size
+            if self.posicion == 0:
+                self.cabecera = f.readline()
+                if not self.cabecera.endswith(b'\n'):
+                    return  # ni la cabecera está completa todavía
+                self.posicion = f.tell()
+            while True:
+                f.seek(self.posicion)
+                datos = f.read(BYTES_POR_LECTURA)
+                # La última fila puede estar a medio escribir: se lee hasta el último salto de línea
+                fin = datos.rfind(b'\n') + 1
+                if fin == 0:
+                    break
+                self.posicion += fin
+                bloque = pd.read_csv(io.BytesIO(self.cabecera + datos[:fin]), dtype=TIPOS_COLUMNAS)
+                yield preparar_tipos(bloque)
+                if len(datos) < BYTES_POR_LECTURA:
+                    break
+            if self.tamano > self.posicion and _asentado(info):
+                # Última fila sin salto de línea en un archivo que dejó de cambiar
+                f.seek(self.posicion)
+                resto = f.read(self.tamano - self.posicion)
+                self.posicion += len(resto)
+                yield preparar_tipos(pd.read_csv(io.BytesIO(self.cabecera + resto), dtype=TIPOS_COLUMNAS))
+        n = min(self.posicion, BYTES_HUELLA)
+        self.huella = (n, _huella(self.ruta, n))
+
+
+class SeguidorEnVivo:
+    """Agregados de un archivo (o directorio de archivos) CSV al día con lo que se le va añadiendo."""
+
+    def __init__(self, ruta, tam_muestra=TAM_MUESTRA):
+        self.ruta = ruta
+        self.tam_muestra = tam_muestra
+        # La generación identifica cada estado de los datos (claves de caché); nunca se repite
+        self.generacion = 0
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.archivos = {}
+        self.agregados = AgregadosPorBloques(self.tam_muestra)
+        # Hashes de 64 bits de los Invoice ID ya sumados
+        self.vistos = ClavesVistas()
+        self.info = None
+
+    def _rutas(self):
+        if os.path.isdir(self.ruta):
+            return sorted(
+                os.path.join(self.ruta, nombre) for nombre in os.listdir(self.ruta) if nombre.endswith('.csv')
+            )
+        return [self.ruta]
+
+    def _archivo(self, ruta):
+        if ruta not in self.archivos:
+            self.archivos[ruta] = ArchivoSeguido(ruta)
+        return self.archivos[ruta]
+
+    def hay_cambios(self):
+        with self._lock:
+            return any(self._archivo(ruta).estado() != 'igual' for ruta in self._rutas())
+
+    def _sin_repetidas(self, bloque):
+        claves = pd.util.hash_pandas_object(bloque['Invoice ID'], index=False).to_numpy()
+        nuevas = ~pd.Series(claves).duplicated().to_numpy() & ~self.vistos.contiene(claves)
+        self.vistos.agregar(claves[nuevas])
+        return bloque[nuevas]
+
+    def refrescar(self):
+        """(agregados, info_carga) con las filas añadidas desde la última llamada.
+
+        Los agregados devueltos son una copia: una actualización posterior no los
+        modifica mientras otra sesión los está usando.
+        """
+        with self._lock:
+            inicio = time.perf_counter()
+            nuevas, reiniciado = 0, False
+            for ruta in self._rutas():
+                archivo = self._archivo(ruta)
+                estado = archivo.estado()
+                if estado == 'igual':
+                    continue
+                if estado == 'truncado' and not os.path.isdir(self.ruta):
+                    # El archivo se reescribió: las filas ya sumadas pueden no estar en él
+                    self._reiniciar()
+                    archivo = self._archivo(ruta)
+                    reiniciado = True
+                elif estado in ('rotado', 'truncado'):
+                    # Archivo nuevo en la misma ruta: se lee entero y las facturas ya
+                    # sumadas se descartan por Invoice ID
+                    archivo.reiniciar()
+                for bloque in archivo.leer_nuevas():
+                    bloque = self._sin_repetidas(bloque)
+                    if len(bloque):
+                        self.agregados.agregar(bloque)
+                        nuevas += len(bloque)
+
+            if nuevas:
+                self.agregados.finalizar()
+            if nuevas or reiniciado:
+                self.generacion += 1
+            if nuevas or self.info is None:
+                version = f"vivo-{self.generacion}"
+                self.info = {
+                    'filas': self.agregados.filas,
+                    'segundos': time.perf_counter() - inicio,
+                    'memoria_mb': self.agregados.memoria_mb(),
+                    'version': version,
+                    'clave': (version, 'bloques'),
+                    'nuevas': nuevas,
+                }
+            return copy.copy(self.agregados), dict(self.info)
+
+
+@st.cache_resource
+def obtener_seguidor(ruta):
+    """Seguidor único por proceso para `ruta`, compartido por todas las sesiones."""
+    return SeguidorEnVivo(ruta)
+
+
+@st.fragment(run_every=INTERVALO_S)
+def vigilar(seguidor):
+    # Cada INTERVALO_S segundos se mira si los archivos crecieron (un stat por
+    # archivo); solo entonces se vuelve a ejecutar el dashboard
+    if seguidor.hay_cambios():
+        st.rerun()
@@ -0,0 +1,297 @@
+# Resúmenes estadísticos combinables, para la tabla de estadísticas
+# descriptivas por tipo de cliente (2.4) y el histograma de calificaciones (2.3).
+# Por cada celda del cubo (fecha x dimensiones de filtro) se guardan:
+#  - los momentos (n, media, M2) de Total, que se combinan con la fórmula de
+#    Chan de correlacion.py (M2 es el comomento de Total consigo mismo);
+#  - los conteos de Rating en barras de ancho fijo, que se suman sin error.
+# Los cuantiles se resumen por franja (combinación de dimensiones x mes), donde
+# K puntos sí comprimen: una celda de un día tiene pocas filas. Cada franja
+# guarda como mucho K puntos con peso: si tiene más de K valores, K de ellos
+# equiespaciados en rango, cada uno con peso n/K, y el rango de cualquier valor
+# tiene un error de como mucho n/K. Al sumar un bloque, los puntos de cada
+# franja que toca se juntan con los del bloque y, si pasan de K, se recomprimen
+# a K; cada recompresión suma a la franja un error del orden de n/K (con los
+# bloques en orden de fecha, una franja se recomprime pocas veces).
+# Las franjas sin comprimir guardan el día de cada valor, así que un rango de
+# fechas que corta un mes a medias las filtra sin error; en las comprimidas se
+# supone que los días elegidos tienen la distribución del mes y el peso de sus
+# puntos se escala por la fracción de filas elegidas. Con rangos de meses
+# enteros el error de rango de un cuantil es, por tanto, de como mucho 1/K.
+# Los puntos y las barras se guardan agrupados (por franja y por celda) con el
+# inicio de cada grupo: una consulta lee solo los de la selección.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import COLUMNAS_CATEGORICAS, igualar_categorias, leer_version
+from correlacion import combinar_comomentos, comomentos_por_grupo, sumar_comomentos
+from cubo import DIMENSIONES, colocar_filas, unir_claves
+
+# Puntos por franja del resumen de cuantiles: error de rango del orden de 1/K
+PUNTOS_CUANTILES = 100
+# Las calificaciones tienen un decimal: con este ancho cada barra es un valor
+ANCHO_BARRA_RATING = 0.1
+
+
+def cuantil_ponderado(valores, pesos, q):
+    """Cuantil `q` de puntos ordenados por valor con pesos (interpolación lineal, como pandas).
+
+    Con pesos unitarios coincide con Series.quantile; con los pesos de un resumen
+    el rango del resultado tiene el error del resumen.
+    """
+    acumulado = np.cumsum(pesos)
+    if len(acumulado) == 0:
+        return np.nan
+    h = q * (acumulado[-1] - 1)
+    bajo = np.floor(h)
+    # El punto i cubre los rangos [acumulado[i-1], acumulado[i])
+    i, j = np.searchsorted(acumulado, [bajo, min(bajo + 1, acumulado[-1] - 1)], side='right')
+    i, j = min(i, len(valores) - 1), min(j, len(valores) - 1)
+    return valores[i] + (h - bajo) * (valores[j] - valores[i])
+
+
+def comprimir_puntos(franja, valor, peso, dia, puntos_franja=PUNTOS_CUANTILES):
+    """Como mucho `puntos_franja` puntos por franja, ordenados por (franja, valor).
+
+    Las franjas con más puntos se reemplazan por `puntos_franja` de ellos, los que
+    cubren los rangos (j + 0.5) W / K de la franja (W: su peso total), cada uno
+    con peso W / K y sin día (0). Con pesos unitarios son los valores en esos rangos.
+    """
+    orden = np.lexsort((valor, franja))
+    franja, valor, peso, dia = franja[orden], valor[orden], peso[orden], dia[orden]
+    _, inicio, cuenta = np.unique(franja, return_index=True, return_counts=True)
+    grandes = np.flatnonzero(cuenta > puntos_franja)
+    if len(grandes) == 0:
+        return franja, valor, peso, dia
+
+    acumulado = np.cumsum(peso)
+    total = np.add.reduceat(peso, inicio)
+    antes = acumulado[inicio] - peso[inicio]
+    grande = np.repeat(grandes, puntos_franja)
+    j = np.tile(np.arange(puntos_franja), len(grandes))
+    objetivo = antes[grande] + (j + 0.5) * total[grande] / puntos_franja
+    # El punto i cubre los rangos [acumulado[i-1], acumulado[i])
+    elegidos = np.minimum(
+        np.searchsorted(acumulado, objetivo, side='right'), inicio[grande] + cuenta[grande] - 1,
+    )
+    conservados = np.flatnonzero(np.repeat(cuenta <= puntos_franja, cuenta))
+    # Los índices de cada franja son contiguos: ordenarlos mantiene el orden por (franja, valor)
+    orden = np.argsort(np.concatenate([conservados, elegidos]), kind='stable')
+    indices = np.concatenate([conservados, elegidos])[orden]
+    pesos = np.concatenate([peso[conservados], (total / puntos_franja)[grande]])[orden]
+    dias = np.concatenate([dia[conservados], np.zeros(len(elegidos), dtype=dia.dtype)])[orden]
+    return franja[indices], valor[indices], pesos, dias
+
+
+def _sumar_barras(celda, barra, conteo):
+    """Une las barras repetidas (misma celda y barra) sumando sus conteos; ordenadas por (celda, barra)."""
+    orden = np.lexsort((barra, celda))
+    celda, barra, conteo = celda[orden], barra[orden], conteo[orden]
+    inicio = np.flatnonzero(np.concatenate([[True], (np.diff(celda) != 0) | (np.diff(barra) != 0)]))
+    return celda[inicio], barra[inicio], np.add.reduceat(conteo, inicio)
+
+
+def _franjas(claves):
+    """Franja de cada celda de `claves` y las claves (Mes + dimensiones) de las franjas, ordenadas por mes."""
+    tabla = claves[COLUMNAS_CATEGORICAS].assign(Mes=claves['Date'].dt.to_period('M').dt.start_time)
+    grupos = tabla.groupby(['Mes'] + COLUMNAS_CATEGORICAS, observed=True, sort=True)
+    return grupos.ngroup().to_numpy(), grupos.size().index.to_frame(index=False)
+
+
+def _inicios(grupo, n_grupos):
+    """Inicio en `grupo` (ordenado) de cada uno de los `n_grupos` grupos y el fin del último."""
+    return np.searchsorted(grupo, np.arange(n_grupos + 1))
+
+
+def _grupos(inicio):
+    """Grupo de cada elemento según los inicios de _inicios."""
+    return np.repeat(np.arange(len(inicio) - 1), np.diff(inicio))
+
+
+def _tramos(inicio, elegidos):
+    """Posiciones de los elementos de los grupos `elegidos` (el grupo g ocupa inicio[g]:inicio[g + 1])."""
+    desde, largo = inicio[elegidos], inicio[elegidos + 1] - inicio[elegidos]
+    return np.repeat(desde - np.cumsum(largo) + largo, largo) + np.arange(largo.sum())
+
+
+def _tocados(inicio, mapa, tocado):
+    """(grupo nuevo, posición) de los elementos de los grupos que `mapa` lleva a un grupo `tocado`."""
+    grupos = np.flatnonzero(tocado[mapa])
+    return np.repeat(mapa[grupos], np.diff(inicio)[grupos]), _tramos(inicio, grupos)
+
+
+def _reubicar(inicio, columnas, mapa, tocado, grupo, nuevas):
+    """(inicio, columnas) con cada grupo g en la posición mapa[g] y los grupos `tocado` reemplazados.
+
+    Los elementos de `nuevas`, con su grupo en `grupo` (ordenado), reemplazan a
+    los de los grupos tocados; los demás grupos se copian tal cual.
+    """
+    quedan = np.flatnonzero(~tocado[mapa])
+    largo = np.bincount(grupo, minlength=len(tocado))
+    largo[mapa[quedan]] = np.diff(inicio)[quedan]
+    nuevo = np.concatenate([[0], np.cumsum(largo)])
+    origen, destino = _tramos(inicio, quedan), _tramos(nuevo, mapa[quedan])
+    reemplazados = _tramos(nuevo, np.flatnonzero(tocado))
+    resultado = []
+    for columna, nueva in zip(columnas, nuevas):
+        valores = np.empty(nuevo[-1], dtype=columna.dtype)
+        valores[destino], valores[reemplazados] = columna[origen], nueva
+        resultado.append(valores)
+    return nuevo, resultado
+
+
+class ResumenesCeldas:
+
+    def __init__(self, claves, momentos, franjas, puntos, barras):
+        # claves: una fila de DIMENSIONES por celda; momentos: (n, medias, comomentos)
+        # de Total por celda, como en correlacion.py con una sola columna; franjas:
+        # (franja de cada celda, claves de las franjas); puntos: (inicio por franja,
+        # valor, peso, día del mes o 0), por franja y valor; barras: (inicio por
+        # celda, barra, conteo), por celda y barra
+        self.claves = claves.reset_index(drop=True)
+        self.momentos = momentos
+        self.franja, self.franjas = franjas
+        self.inicio_punto, self.valor, self.peso, self.dia = puntos
+        self.inicio_barra, self.barra, self.conteo = barras
+        self.n_franja = np.bincount(self.franja, weights=momentos[0], minlength=len(self.franjas))
+
+    @classmethod
+    def desde_datos(cls, data, columna='Total', puntos_franja=PUNTOS_CUANTILES):
+        """Resúmenes de las celdas de `data`, en el mismo orden que cubo.construir_cubo."""
+        grupos = data.groupby(DIMENSIONES, observed=True, sort=True)
+        celda = grupos.ngroup().to_numpy()
+        claves = grupos.size().index.to_frame(index=False)
+        n_celdas = len(claves)
+        franja, franjas = _franjas(claves)
+
+        valor = data[columna].to_numpy(dtype='float64')
+        momentos = comomentos_por_grupo(celda, valor[:, None], n_celdas)
+
+        dia = data['Date'].dt.day.to_numpy(dtype='int8')
+        franja_punto, valor, peso, dia = comprimir_puntos(franja[celda], valor, np.ones(len(valor)), dia, puntos_franja)
+        puntos = _inicios(franja_punto, len(franjas)), valor, peso, dia
+
+        barra = np.floor(data['Rating'].to_numpy(dtype='float64') / ANCHO_BARRA_RATING + 0.5).astype('int64')
+        celda_barra, barra, conteo = _sumar_barras(celda, barra, np.ones(len(barra)))
+        barras = _inicios(celda_barra, n_celdas), barra, conteo
+        return cls(claves, momentos, (franja, franjas), puntos, barras)
+
+    def sumar(self, parcial, claves, mapa, mapa_parcial, puntos_franja=PUNTOS_CUANTILES):
+        """Resúmenes sobre las celdas `claves` con los de `parcial` (otro bloque) sumados a estos.
+
+        `mapa` y `mapa_parcial` son la posición en `claves` de las celdas de cada
+        uno (ver cubo.combinar_cubos). Solo se recalculan las celdas y franjas
+        que toca `parcial`; las barras y puntos de las demás se copian a su
+        nueva posición.
+        """
+        n_celdas = len(claves)
+
+        n, media, m2 = np.zeros(n_celdas), np.zeros((n_celdas, 1)), np.zeros((n_celdas, 1, 1))
+        n[mapa], media[mapa], m2[mapa] = self.momentos
+        n[mapa_parcial], media[mapa_parcial], m2[mapa_parcial] = sumar_comomentos(
+            (n[mapa_parcial], media[mapa_parcial], m2[mapa_parcial]), parcial.momentos,
+        )
+
+        # Barras de las celdas tocadas: las de estos resúmenes más las de `parcial`
+        tocada = np.zeros(n_celdas, dtype=bool)
+        tocada[mapa_parcial] = True
+        celda, posiciones = _tocados(self.inicio_barra, mapa, tocada)
+        celda, barra, conteo = _sumar_barras(
+            np.concatenate([celda, mapa_parcial[_grupos(parcial.inicio_barra)]]),
+            np.concatenate([self.barra[posiciones], parcial.barra]),
+            np.concatenate([self.conteo[posiciones], parcial.conteo]),
+        )
+        inicio_barra, barras = _reubicar(self.inicio_barra, (self.barra, self.conteo), mapa, tocada, celda, (barra, conteo))
+
+        # Franjas: las de `parcial` se unen a estas por su clave (mes y dimensiones)
+        franjas, franjas_parcial = igualar_categorias([self.franjas, parcial.franjas])
+        mapa_franja, mapa_franja_parcial, _, n_franjas = unir_claves(franjas, franjas_parcial, ['Mes'] + COLUMNAS_CATEGORICAS)
+        franjas = colocar_filas(franjas, franjas_parcial, mapa_franja, mapa_franja_parcial, n_franjas)
+        franja = np.empty(n_celdas, dtype='int64')
+        franja[mapa], franja[mapa_parcial] = mapa_franja[self.franja], mapa_franja_parcial[parcial.franja]
+
+        # Los puntos de las franjas tocadas se juntan con los de `parcial` y se recomprimen
+        tocada = np.zeros(n_franjas, dtype=bool)
+        tocada[mapa_franja_parcial] = True
+        franja_punto, posiciones = _tocados(self.inicio_punto, mapa_franja, tocada)
+        franja_punto, valor, peso, dia = comprimir_puntos(
+            np.concatenate([franja_punto, mapa_franja_parcial[_grupos(parcial.inicio_punto)]]),
+            np.concatenate([self.valor[posiciones], parcial.valor]),
+            np.concatenate([self.peso[posiciones], parcial.peso]),
+            np.concatenate([self.dia[posiciones], parcial.dia]),
+            puntos_franja,
+        )
+        inicio_punto, puntos = _reubicar(
+            self.inicio_punto, (self.valor, self.peso, self.dia), mapa_franja, tocada, franja_punto, (valor, peso, dia),
+        )
+        return type(self)(claves, (n, media, m2), (franja, franjas), (inicio_punto, *puntos), (inicio_barra, *barras))
+
+    def _puntos_seleccion(self, celdas):
+        """(franja, valor, peso) de los puntos de las franjas que tocan las celdas `celdas`.
+
+        En las franjas que el rango de fechas corta a medias, los puntos con día se
+        filtran por los días elegidos y los comprimidos se escalan por la fracción
+        de filas elegidas.
+        """
+        elegidas = np.bincount(self.franja[celdas], weights=self.momentos[0][celdas], minlength=len(self.franjas))
+        franjas = np.flatnonzero(elegidas)
+        posiciones = _tramos(self.inicio_punto, franjas)
+        franja = np.repeat(franjas, np.diff(self.inicio_punto)[franjas])
+        valor, peso, dia = self.valor[posiciones], self.peso[posiciones], self.dia[posiciones]
+
+        parcial = elegidas[franja] < self.n_franja[franja]
+        if parcial.any():
+            # Un día dentro de su franja (que es de un mes) se identifica por el día del mes
+            dia_celda = self.claves['Date'].dt.day.to_numpy()[celdas]
+            dias = np.isin(franja * 32 + dia, self.franja[celdas] * 32 + dia_celda)
+            con_dia = parcial & (dia > 0)
+            peso[con_dia] *= dias[con_dia]
+            comprimidos = parcial & (dia == 0)
+            peso[comprimidos] *= (elegidas / self.n_franja)[franja[comprimidos]]
+        return franja, valor, peso
+
+    def describir_por(self, celdas, por, cuantiles=(0.25, 0.5, 0.75)):
+        """Conteo, media, desviación estándar (muestral) y cuantiles de Total por grupo de `por`."""
+        columna = self.claves[por].astype('category')
+        codigos, categorias = columna.cat.codes.to_numpy(), columna.cat.categories
+        n, media, m2 = combinar_comomentos(
+            codigos[celdas], *(x[celdas] for x in self.momentos), minlength=len(categorias),
+        )
+        resumen = pd.DataFrame({
+            'count': n.astype('int64'),
+            'mean': media[:, 0],
+            'std': np.sqrt(m2[:, 0, 0] / np.maximum(n - 1, 1)),
+        }, index=pd.Index(categorias, name=por))
+        resumen.loc[n < 2, 'std'] = np.nan
+
+        franja, valor, peso = self._puntos_seleccion(celdas)
+        grupo = self.franjas[por].astype(columna.dtype).cat.codes.to_numpy()[franja]
+        valores = {q: np.full(len(categorias), np.nan) for q in cuantiles}
+        for k in np.flatnonzero(n):
+            elegidos = np.flatnonzero((grupo == k) & (peso > 0))
+            elegidos = elegidos[np.argsort(valor[elegidos], kind='stable')]
+            for q in cuantiles:
+                valores[q][k] = cuantil_ponderado(valor[elegidos], peso[elegidos], q)
+        for q in cuantiles:
+            resumen[f'{q:.0%}'] = valores[q]
+        return resumen[n > 0]
+
+    def histograma(self, celdas):
+        """Conteo de Rating por barra de ancho ANCHO_BARRA_RATING (columnas 'Rating' = centro y 'conteo')."""
+        posiciones = _tramos(self.inicio_barra, np.asarray(celdas, dtype='int64'))
+        barra, conteo = self.barra[posiciones], self.conteo[posiciones]
+        if len(barra) == 0:
+            return pd.DataFrame({'Rating': [], 'conteo': []})
+        primera = barra.min()
+        conteos = np.bincount(barra - primera, weights=conteo)
+        centros = (np.arange(len(conteos)) + primera) * ANCHO_BARRA_RATING
+        visibles = conteos > 0
+        return pd.DataFrame({'Rating': centros[visibles].round(6), 'conteo': conteos[visibles].astype('int64')})
+
+
+@st.cache_resource(max_entries=2, show_spinner="Preparando estadísticas...")
+def obtener_resumenes(ruta, version):
+    """Resúmenes compartidos entre sesiones para la versión `version` de los datos."""
+    data, _ = leer_version(ruta, version, DIMENSIONES + ['Total', 'Rating'])
+    return ResumenesCeldas.desde_datos(data)
@@ -0,0 +1,130 @@
+# Motor de filtros para la barra lateral de segmentación.
+# En lugar de recorrer el DataFrame completo con una máscara por filtro en cada
+# re-ejecución, se precalcula al cargar los datos un bitmap (empaquetado, 1 bit
+# por fila) por cada valor de cada columna categórica y el orden de las filas
+# por fecha. Una selección se resuelve con OR/AND de bitmaps y una búsqueda
+# binaria del rango de fechas.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import COLUMNAS_CATEGORICAS, VersionesEnCache
+
+
+class IndiceFiltros:
+
+    def __init__(self, data, columnas=COLUMNAS_CATEGORICAS, columna_fecha='Date'):
+        self.n = len(data)
+        self.bitmaps = {}
+        for col in columnas:
+            categorias = data[col].astype('category')
+            codigos = categorias.cat.codes.to_numpy()
+            self.bitmaps[col] = {
+                valor: np.packbits(codigos == k)
+                for k, valor in enumerate(categorias.cat.categories)
+            }
+
+        fechas = data[columna_fecha].to_numpy()
+        self.ordenado = bool(np.all(fechas[1:] >= fechas[:-1]))
+        self.orden = None if self.ordenado else np.argsort(fechas, kind='stable')
+        self.fechas = fechas if self.ordenado else fechas[self.orden]
+
+    def _bitmap_columna(self, col, valores, inicio, fin):
+        """OR de los bitmaps de `valores` en la columna, restringido a los bytes [inicio, fin)."""
+        bitmaps = self.bitmaps[col]
+        valores = [v for v in dict.fromkeys(valores) if v in bitmaps]
+        if len(valores) == len(bitmaps):
+            return None  # todos seleccionados: el filtro no descarta filas
+        # Si se selecciona más de la mitad, es más barato negar el OR de los no seleccionados
+        negar = len(valores) > len(bitmaps) / 2
+        if negar:
+            valores = [v for v in bitmaps if v not in valores]
+        resultado = np.zeros(fin - inicio, dtype=np.uint8)
+        for valor in valores:
+            resultado |= bitmaps[valor][inicio:fin]
+        return ~resultado if negar else resultado
+
+    def indices(self, selecciones, rango_fechas=None):
+        """Posiciones de las filas que cumplen `selecciones` ({columna: valores}) y el rango de fechas."""
+        lo, hi = 0, self.n
+        if rango_fechas is not None:
+            inicio = np.datetime64(pd.to_datetime(rango_fechas[0]))
+            fin = np.datetime64(pd.to_datetime(rango_fechas[1]))
+            lo = int(np.searchsorted(self.fechas, inicio, side='left'))
+            hi = int(np.searchsorted(self.fechas, fin, side='right'))
+        if lo >= hi:
+            return np.empty(0, dtype=np.int64)
+
+        # Con los datos ordenados por fecha el rango es contiguo: solo se combinan
+        # los bytes de los bitmaps que cubren [lo, hi)
+        b_ini, b_fin = (lo // 8, (hi + 7) // 8) if self.ordenado else (0, (self.n + 7) // 8)
+        combinado = None
+        for col, valores in selecciones.items():
+            bitmap = self._bitmap_columna(col, valores, b_ini, b_fin)
+            if bitmap is None:
+                continue
+            combinado = bitmap if combinado is None else combinado & bitmap
+
+        if self.ordenado:
+            if combinado is None:
+                return np.arange(lo, hi)
+            bits = np.unpackbits(combinado, count=hi - b_ini * 8)[lo - b_ini * 8:]
+            return np.flatnonzero(bits) + lo
+
+        en_rango = np.sort(self.orden[lo:hi])
+        if combinado is None:
+            return en_rango
+        bits = np.unpackbits(combinado, count=self.n).astype(bool)
+        return en_rango[bits[en_rango]]
+
+    def filtrar(self, data, selecciones, rango_fechas=None):
+        indices = self.indices(selecciones, rango_fechas)
+        if len(indices) == self.n:
+            return data  # nada que descartar: se evita copiar el DataFrame
+        return data.iloc[indices]
+
+    def vista(self, data, selecciones, rango_fechas=None):
+        """Como filtrar, pero sin copiar filas: una VistaFiltrada sobre `data`."""
+        return VistaFiltrada(data, self.indices(selecciones, rango_fechas))
+
+
+class VistaFiltrada:
+    """Filas seleccionadas de un DataFrame compartido entre sesiones, guardadas como posiciones.
+
+    Se indexa como un DataFrame (vista['col'], vista[['a', 'b']]); solo entonces
+    se copian las filas seleccionadas, y solo de esas columnas.
+    """
+
+    def __init__(self, data, indices):
+        self.data = data
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.completa = len(self.indices) == len(data)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, columnas):
+        seleccion = self.data[columnas]
+        return seleccion if self.completa else seleccion.iloc[self.indices]
+
+    def take(self, posiciones):
+        """Vista con las filas `posiciones` (relativas a esta vista), como DataFrame.take."""
+        return VistaFiltrada(self.data, self.indices[posiciones])
+
+
+@st.cache_resource(max_entries=10)
+def _indice_en_cache(_data, clave):
+    return IndiceFiltros(_data)
+
+
+_versiones_indices = VersionesEnCache(_indice_en_cache)
+
+
+def obtener_indice(data, clave):
+    """Índice compartido para el DataFrame cargado identificado por `clave` (versión de los datos, ...).
+
+    Al cambiar la versión se descartan los índices de la anterior.
+    """
+    _versiones_indices.registrar(None, clave[0], None, clave)
+    return _indice_en_cache(data, clave)
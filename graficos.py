@@ -0,0 +1,230 @@
+# Gráficos de los dashboards del Grupo 39.
+# Cada función recibe los datos ya preparados (agregados del cubo o filas
+# filtradas) y devuelve la figura de matplotlib, sin llamar a Streamlit; así
+# las figuras se pueden guardar en caché, renderizar en otros procesos y
+# compartir entre los dos dashboards.
+
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401  (registra la proyección '3d')
+
+from muestreo import banda_regresion
+
+# Los segmentos por debajo de esta fracción de la barra más alta no llevan etiqueta
+FRACCION_MINIMA_ETIQUETA = 0.02
+
+# Mismas opciones que usa st.pyplot para guardar la figura
+OPCIONES_PNG = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+
+def figura_a_png(fig):
+    """Renderiza `fig` a bytes PNG y la cierra para liberar su memoria."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, **OPCIONES_PNG)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def etiquetables(valores, maximo, fraccion_minima=None):
+    """Máscara de los valores que llevan etiqueta: positivos y de al menos `fraccion_minima` de `maximo`."""
+    if fraccion_minima is None:
+        fraccion_minima = FRACCION_MINIMA_ETIQUETA
+    return (valores > 0) & (valores >= fraccion_minima * maximo)
+
+
+def etiquetas_apiladas(df_grouped, fraccion_minima=None):
+    """Posiciones (x, y) y textos de las etiquetas de un gráfico de barras apiladas.
+
+    Las posiciones salen de sumas acumuladas sobre la tabla (filas = barras,
+    columnas = segmentos); los segmentos más bajos que `fraccion_minima` de la
+    barra más alta no se etiquetan.
+    """
+    valores = np.nan_to_num(df_grouped.to_numpy(dtype='float64'))
+    valores = np.where(valores > 0, valores, 0)
+    techo = valores.cumsum(axis=1)
+    centro = techo - valores / 2
+    visibles = etiquetables(valores, techo[:, -1].max(initial=0), fraccion_minima)
+    filas, _ = np.nonzero(visibles)
+    textos = np.char.mod('%.0f', valores[visibles])
+    return filas, centro[visibles], textos
+
+
+def observados(columna):
+    """Valores de `columna` que aparecen, en orden de aparición.
+
+    Con columnas categóricas seaborn dibuja un lugar por categoría (aparezca o
+    no en los datos filtrados) y en el orden de las categorías; pasando esta
+    lista como `order` se dibuja como con columnas de texto.
+    """
+    return list(columna.unique())
+
+
+def renderizar(funcion, *args, **kwargs):
+    """Dibuja con `funcion(*args, **kwargs)` y devuelve el PNG."""
+    return figura_a_png(funcion(*args, **kwargs))
+
+
+def ventas_por_periodo(ventas, resolucion='D', rango=None):
+    # `ventas` viene de series_tiempo.SeriesTiempo.serie: un punto por día, semana o mes.
+    # `rango` (primer y último día) fija el eje aunque los extremos no tengan ventas
+    titulos = {'D': 'Ventas Diarias Totales', 'W': 'Ventas Semanales Totales', 'M': 'Ventas Mensuales Totales'}
+    fig, ax = plt.subplots(figsize=(14, 7))
+    ventas.plot(kind='line', marker='o', ax=ax)
+    ax.set_title(titulos[resolucion])
+    ax.set_xlabel('Fecha')
+    ax.set_ylabel('Ventas Totales')
+    if rango is not None:
+        ax.set_xlim(*rango)
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def ventas_por_hora(ventas_por_hora):
+    fig, ax = plt.subplots(figsize=(14, 5))
+    ax.bar(ventas_por_hora.index, ventas_por_hora.to_numpy(), color='steelblue')
+    ax.set_title('Ventas Totales por Hora del Día')
+    ax.set_xlabel('Hora')
+    ax.set_ylabel('Ventas Totales')
+    ax.set_xticks(ventas_por_hora.index)
+    ax.set_xticklabels([f'{hora:02d}:00' for hora in ventas_por_hora.index])
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def ventas_por_producto(ventas_por_producto):
+    # Las barras siguen el orden de las filas (de mayor a menor Total)
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.barplot(
+        data=ventas_por_producto, x='Total', y='Product line', order=observados(ventas_por_producto['Product line']),
+        color='steelblue', ax=ax,
+    )
+    ax.set_title('Ventas Totales por Línea de Producto')
+    ax.set_xlabel('Total Ventas')
+    ax.set_ylabel('Línea de Producto')
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+def distribucion_rating(data, ancho_barra=None):
+    # `data` puede traer una fila por factura o una fila por barra (su centro en
+    # Rating y su 'conteo'), como devuelve estadisticas.ResumenesCeldas.histograma
+    if ancho_barra is None:
+        barras = {'bins': 40}
+    else:
+        rango = (data['Rating'].min() - ancho_barra / 2, data['Rating'].max() + ancho_barra / 2)
+        barras = {'binwidth': ancho_barra, 'binrange': rango}
+    pesos = 'conteo' if 'conteo' in data else None
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.histplot(data=data, x='Rating', weights=pesos, kde=True, color='steelblue', edgecolor='black', ax=ax, **barras)
+    ax.set_title('Distribución de la Calificación del Cliente')
+    ax.set_xlabel('Rating')
+    ax.set_ylabel('Frecuencia')
+    return fig
+
+
+def gasto_por_tipo_cliente(data):
+    custom_palette = {'Member': 'steelblue', 'Normal': '#F4A7B9'}
+    fig, ax = plt.subplots(figsize=(14, 7))
+    orden = observados(data['Customer type'])
+    # dodge=False: con columnas categóricas seaborn desplazaría cada caja como si hue fuera otra variable
+    sns.boxplot(
+        data=data, x='Customer type', y='Total', hue='Customer type', order=orden, hue_order=orden,
+        palette=custom_palette, dodge=False, ax=ax,
+    )
+    ax.set_title('Distribución del Gasto por Tipo de Cliente')
+    return fig
+
+
+def costo_vs_ganancia(puntos, regresion):
+    # `puntos` puede ser una muestra; la recta y su banda vienen de `regresion`,
+    # calculada con todas las filas a partir de los comomentos por celda
+    # (ver MotorCorrelacion.momentos_pareados y muestreo.regresion_desde_momentos)
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.scatterplot(data=puntos, x='cogs', y='gross income', alpha=0.6, color='steelblue', ax=ax)
+    x, y, semiancho = banda_regresion(regresion)
+    ax.plot(x, y, color='darkred')
+    ax.fill_between(x, y - semiancho, y + semiancho, color='darkred', alpha=0.15, linewidth=0)
+    ax.set_title('Relación Costo de Bienes y Ganancia Bruta')
+    return fig
+
+
+def metodos_pago(conteo_pagos):
+    custom_palette = {'Credit card': 'steelblue', 'Cash': '#F4A7B9', 'Ewallet': '#FFD580'}
+    fig, ax = plt.subplots(figsize=(14, 7))
+    orden = observados(conteo_pagos['Payment'])
+    sns.barplot(
+        data=conteo_pagos, x='Payment', y='count', hue='Payment', order=orden, hue_order=orden,
+        palette=custom_palette, legend=False, dodge=False, ax=ax,
+    )
+    ax.set_title('Métodos de Pago Preferidos')
+    # Una llamada por grupo de barras; se omiten las etiquetas de barras demasiado bajas para leerse
+    for contenedor in ax.containers:
+        alturas = contenedor.datavalues
+        visibles = etiquetables(alturas, conteo_pagos['count'].max())
+        ax.bar_label(contenedor, labels=np.where(visibles, alturas.astype(int).astype(str), ''),
+                     label_type='center', color='white', fontsize=12, fontweight='bold')
+    return fig
+
+
+def matriz_correlacion(correlation_matrix):
+    fig, ax = plt.subplots(figsize=(14, 7))
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=0.5, ax=ax)
+    ax.set_title('Matriz de Correlación entre Variables Numéricas')
+    return fig
+
+
+def ingreso_sucursal_producto(df_grouped, detallado=True):
+    fig, ax = plt.subplots(figsize=(14, 7))
+    df_grouped.plot(kind='bar', stacked=True, ax=ax, colormap='Set3')
+    if detallado:
+        ax.set_title('Composición del Ingreso Bruto por Sucursal y Línea de Producto', fontsize=14)
+        ax.set_xlabel('Sucursal (Branch)')
+        ax.set_ylabel('Ingreso Bruto Total')
+        ax.legend(title='Línea de Producto', bbox_to_anchor=(1.05, 1), loc='upper left')
+    else:
+        ax.set_title('Ingreso Bruto por Sucursal y Línea de Producto')
+    for x, y, texto in zip(*etiquetas_apiladas(df_grouped)):
+        ax.text(x, y, texto, ha='center', va='center', fontsize=8)
+    fig.tight_layout()
+    return fig
+
+
+def total_por_genero_y_tipo(data):
+    g = sns.FacetGrid(
+        data, col="Gender", row="Customer type", col_order=observados(data["Gender"]),
+        row_order=observados(data["Customer type"]), margin_titles=True, height=4,
+    )
+    g.map(sns.histplot, "Total", bins=20, kde=True)
+    g.fig.subplots_adjust(top=0.9)
+    g.fig.suptitle("Distribución del Total de Compras según Género y Tipo de Cliente")
+    return g.fig
+
+
+def dispersion_3d(data):
+    fig = plt.figure(figsize=(14, 7))
+    ax = fig.add_subplot(111, projection='3d')
+
+    x = data['Unit price']
+    y = data['Quantity']
+    z = data['Rating']
+
+    sc = ax.scatter(x, y, z, c=z, cmap='viridis', alpha=0.8)
+    ax.set_xlabel('Unit Price')
+    ax.set_ylabel('Quantity')
+    ax.set_zlabel('Rating')
+    ax.set_title('Visualización 3D: Unit Price vs Quantity vs Rating')
+
+    cbar = fig.colorbar(sc, ax=ax, shrink=0.5)
+    cbar.set_label('Rating')
+
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,92 @@
+# Recalculo incremental de las vistas agregadas al cambiar los filtros.
+# Cada sesión guarda la selección anterior (como máscara sobre las celdas del
+# cubo) y las sumas de cada vista. Al cambiar un filtro solo se suman las celdas
+# que entran y se restan las que salen, así que el trabajo es proporcional al
+# cambio y no al tamaño de la tabla. Si la selección no cambia de celdas, las
+# vistas (y las figuras que dependen de ellas) no se tocan.
+
+import hashlib
+
+import numpy as np
+import streamlit as st
+
+# Agrupaciones del cubo que usa el dashboard: nombre -> dimensiones
+AGRUPACIONES = {
+    'total': [],
+    'Product line': ['Product line'],
+    'Payment': ['Payment'],
+    'Branch': ['Branch'],
+    'Branch x Product line': ['Branch', 'Product line'],
+}
+# Cada cierto número de actualizaciones se recalcula todo para no acumular error de redondeo
+MAX_ACTUALIZACIONES = 50
+
+
+def huella_seleccion(indices):
+    """Resumen corto de las celdas seleccionadas: identifica el contenido de las vistas."""
+    return hashlib.blake2b(np.asarray(indices, dtype=np.int64).tobytes(), digest_size=16).hexdigest()
+
+
+class VistasIncrementales:
+
+    def __init__(self, cubo, agrupaciones=AGRUPACIONES):
+        self.cubo = cubo
+        self.agrupaciones = agrupaciones
+        # Solo las columnas aditivas admiten restar; min/max se calculan aparte
+        self.columnas = [col for col in cubo.columns if col == 'n' or col.startswith('suma')]
+        self.mascara = np.zeros(len(cubo), dtype=bool)
+        self.sumas = self._sumar(np.empty(0, dtype=np.int64))
+        self.actualizaciones = 0
+        self.celdas_cambiadas = 0
+
+    def _sumar(self, filas):
+        parte = self.cubo.iloc[filas]
+        sumas = {}
+        for nombre, dims in self.agrupaciones.items():
+            if dims:
+                sumas[nombre] = parte.groupby(dims, observed=True)[self.columnas].sum()
+            else:
+                sumas[nombre] = parte[self.columnas].sum().to_frame().T
+        return sumas
+
+    def actualizar(self, indices):
+        """Lleva las vistas a la selección `indices` (celdas del cubo). Devuelve False si no cambió nada."""
+        nueva = np.zeros(len(self.cubo), dtype=bool)
+        nueva[indices] = True
+        entran = np.flatnonzero(nueva & ~self.mascara)
+        salen = np.flatnonzero(self.mascara & ~nueva)
+        self.celdas_cambiadas = len(entran) + len(salen)
+        if self.celdas_cambiadas == 0:
+            return False
+
+        if self.celdas_cambiadas >= len(indices) or self.actualizaciones >= MAX_ACTUALIZACIONES:
+            # Cambiar más celdas de las que quedan seleccionadas cuesta más que recalcular
+            self.sumas = self._sumar(indices)
+            self.actualizaciones = 0
+        else:
+            sumas_entran, sumas_salen = self._sumar(entran), self._sumar(salen)
+            for nombre, sumas in self.sumas.items():
+                sumas = sumas.add(sumas_entran[nombre], fill_value=0).sub(sumas_salen[nombre], fill_value=0)
+                sumas['n'] = sumas['n'].round().astype('int64')
+                # Los grupos que se quedan sin filas desaparecen, como en un groupby normal
+                if self.agrupaciones[nombre]:
+                    sumas = sumas[sumas['n'] > 0].sort_index()
+                self.sumas[nombre] = sumas
+            self.actualizaciones += 1
+        self.mascara = nueva
+        return True
+
+    def vista(self, nombre):
+        """Sumas de la vista como un cubo reducido (dimensiones como columnas), apto para cubo.sumar_por."""
+        return self.sumas[nombre].reset_index(drop=not self.agrupaciones[nombre])
+
+
+def obtener_vistas(cubo, clave_cubo, indices):
+    """Vistas de la sesión actual actualizadas a la selección `indices`."""
+    estado = st.session_state.get('vistas_incrementales')
+    if estado is None or estado[0] != clave_cubo:
+        estado = (clave_cubo, VistasIncrementales(cubo))
+        st.session_state['vistas_incrementales'] = estado
+    vistas = estado[1]
+    vistas.actualizar(indices)
+    return vistas
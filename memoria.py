@@ -0,0 +1,125 @@
+# Informe de memoria del proceso del dashboard.
+# Los datos, el cubo y los demás agregados se cargan una vez por proceso
+# (st.cache_resource) y todas las sesiones los leen sin copiarlos; cada sesión
+# guarda solo sus selecciones (posiciones de filas y de celdas) y sus vistas
+# agregadas. Aquí se estima cuánto ocupa cada parte: lo compartido una sola
+# vez y lo propio de cada sesión activa.
+
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Una sesión sin ejecuciones durante este tiempo deja de contarse
+SESION_INACTIVA_S = 30 * 60
+
+
+def tamano_bytes(objeto, excluir=()):
+    """Bytes aproximados de `objeto` y lo que contiene, sin contar los objetos de `excluir`."""
+    vistos = {id(obj) for obj in excluir}
+    pendientes, total = [objeto], 0
+    while pendientes:
+        obj = pendientes.pop()
+        if obj is None or id(obj) in vistos:
+            continue
+        vistos.add(id(obj))
+        if isinstance(obj, pd.DataFrame):
+            total += int(obj.memory_usage(deep=True).sum())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            total += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, np.ndarray):
+            total += obj.nbytes
+        elif isinstance(obj, (str, bytes, int, float, bool)):
+            total += sys.getsizeof(obj)
+        elif isinstance(obj, dict):
+            pendientes.extend(obj.keys())
+            pendientes.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pendientes.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            pendientes.extend(vars(obj).values())
+    return total
+
+
+class RegistroMemoria:
+    """Objetos compartidos del proceso y memoria propia de cada sesión."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id -> (nombre, referencia débil, bytes): el tamaño de un objeto compartido
+        # se calcula una vez; deja de contarse cuando el objeto se libera
+        self._compartidos = {}
+        # id de sesión -> (última ejecución, bytes)
+        self._sesiones = {}
+
+    def compartir(self, nombre, objeto):
+        """Registra `objeto` (de solo lectura) como compartido entre sesiones."""
+        with self._lock:
+            registrado = self._compartidos.get(id(objeto))
+            if registrado is not None and registrado[1]() is objeto:
+                return
+        tamano = tamano_bytes(objeto)
+        with self._lock:
+            self._compartidos[id(objeto)] = (nombre, weakref.ref(objeto), tamano)
+
+    def compartidos(self):
+        """{nombre: bytes} de los objetos compartidos que siguen en memoria."""
+        with self._lock:
+            vivos = {clave: valor for clave, valor in self._compartidos.items() if valor[1]() is not None}
+            self._compartidos = vivos
+        por_nombre = {}
+        for nombre, _, tamano in vivos.values():
+            por_nombre[nombre] = por_nombre.get(nombre, 0) + tamano
+        return por_nombre
+
+    def registrar_sesion(self, tamano):
+        """Anota los bytes propios de la sesión que está ejecutando el script."""
+        contexto = get_script_run_ctx()
+        sesion = contexto.session_id if contexto is not None else 'local'
+        with self._lock:
+            self._sesiones[sesion] = (time.time(), tamano)
+        return sesion
+
+    def sesiones(self):
+        """{id de sesión: bytes} de las sesiones activas."""
+        limite = time.time() - SESION_INACTIVA_S
+        with self._lock:
+            self._sesiones = {s: v for s, v in self._sesiones.items() if v[0] >= limite}
+            return {s: tamano for s, (_, tamano) in self._sesiones.items()}
+
+
+@st.cache_resource
+def obtener_registro():
+    """Registro único por proceso, compartido por todas las sesiones."""
+    return RegistroMemoria()
+
+
+def mostrar_memoria(compartidos, propios, otros_compartidos=None):
+    """Desplegable de la barra lateral con la memoria de esta sesión, la compartida y el total.
+
+    `compartidos` son los objetos de solo lectura del proceso ({nombre: objeto}),
+    `propios` lo que guarda la sesión (sin contar lo que referencia de
+    `compartidos`) y `otros_compartidos` los bytes de lo compartido cuyo tamaño
+    cambia (por ejemplo, la caché de figuras).
+    """
+    registro = obtener_registro()
+    for nombre, objeto in compartidos.items():
+        registro.compartir(nombre, objeto)
+    sesion = registro.registrar_sesion(tamano_bytes(propios, excluir=compartidos.values()))
+
+    mb = lambda n: n / 2**20  # noqa: E731
+    por_nombre = {**registro.compartidos(), **(otros_compartidos or {})}
+    sesiones = registro.sesiones()
+    total_compartido, total_sesiones = sum(por_nombre.values()), sum(sesiones.values())
+    with st.sidebar.expander("Memoria"):
+        st.caption(f"Esta sesión: {mb(sesiones.get(sesion, 0)):.2f} MB (selección y vistas)")
+        st.caption(f"Compartido entre sesiones: {mb(total_compartido):.1f} MB")
+        for nombre, tamano in sorted(por_nombre.items(), key=lambda item: -item[1]):
+            st.caption(f"· {nombre}: {mb(tamano):.1f} MB")
+        st.caption(f"{len(sesiones)} sesiones activas: {mb(total_sesiones):.2f} MB")
+        st.caption(f"Total: {mb(total_compartido + total_sesiones):.1f} MB")
@@ -0,0 +1,77 @@
+# Submuestreo para los gráficos de puntos (2.5 dispersión y 4.1 3D).
+# Con millones de filas dibujar cada punto tarda decenas de segundos y produce
+# imágenes enormes: se dibuja como mucho PRESUPUESTO_PUNTOS puntos, elegidos por
+# muestreo estratificado, mientras que la recta de regresión, su banda de
+# confianza y el coeficiente de Pearson se calculan con todos los datos a partir
+# de los comomentos por celda de correlacion.py.
+
+import os
+
+import numpy as np
+
+PRESUPUESTO_PUNTOS = int(os.environ.get('G39_PUNTOS', 5000))
+# Valor crítico normal para la banda de confianza del 95 % de la recta
+Z_95 = 1.959964
+
+
+def muestra_estratificada(data, presupuesto=PRESUPUESTO_PUNTOS, estrato='Product line', semilla=39):
+    """Hasta `presupuesto` filas de `data`, con cada estrato representado en proporción a su tamaño.
+
+    `data` puede ser un DataFrame o una filtros.VistaFiltrada: solo se leen la
+    columna del estrato y las filas elegidas.
+    """
+    if len(data) <= presupuesto:
+        return data
+    rng = np.random.default_rng(semilla)
+    codigos = data[estrato].astype('category').cat.codes.to_numpy()
+    tamanos = np.bincount(codigos)
+    # Reparto proporcional por restos mayores: las cuotas suman exactamente `presupuesto`
+    ideal = tamanos * presupuesto / len(data)
+    cuotas = np.floor(ideal).astype(int)
+    faltan = presupuesto - cuotas.sum()
+    cuotas[np.argsort(cuotas - ideal, kind='stable')[:faltan]] += 1
+
+    # Orden aleatorio dentro de cada estrato y se conservan las primeras `cuota` filas
+    orden = np.lexsort((rng.random(len(data)), codigos))
+    inicio_estrato = np.concatenate([[0], np.cumsum(tamanos)[:-1]])
+    rango_en_estrato = np.arange(len(data)) - inicio_estrato[codigos[orden]]
+    elegidas = np.sort(orden[rango_en_estrato < cuotas[codigos[orden]]])
+    return data.take(elegidas)
+
+
+def regresion_desde_momentos(momentos, x_min, x_max):
+    """Recta de mínimos cuadrados, Pearson y error estándar de la recta a partir de los momentos."""
+    n, sx, sy, sxx, syy, sxy = momentos
+    media_x, media_y = sx / n, sy / n
+    ssx = sxx - sx * media_x
+    ssy = syy - sy * media_y
+    spxy = sxy - sx * media_y
+    pendiente = spxy / ssx if ssx > 0 else np.nan
+    residual = max(ssy - pendiente * spxy, 0.0) if ssx > 0 else np.nan
+    return {
+        'n': int(n),
+        'pendiente': pendiente,
+        'intercepto': media_y - pendiente * media_x,
+        'pearson': spxy / np.sqrt(ssx * ssy) if ssx > 0 and ssy > 0 else np.nan,
+        'media_x': media_x,
+        'ssx': ssx,
+        'error_std': np.sqrt(residual / (n - 2)) if n > 2 else np.nan,
+        'x_min': float(x_min),
+        'x_max': float(x_max),
+    }
+
+
+def banda_regresion(regresion, puntos=100):
+    """(x, ŷ, semiancho) de la recta con su banda de confianza del 95 % para la media."""
+    x = np.linspace(regresion['x_min'], regresion['x_max'], puntos)
+    y = regresion['intercepto'] + regresion['pendiente'] * x
+    semiancho = Z_95 * regresion['error_std'] * np.sqrt(
+        1 / regresion['n'] + (x - regresion['media_x']) ** 2 / regresion['ssx']
+    )
+    return x, y, semiancho
+
+
+def etiqueta_muestra(mostrados, total):
+    if mostrados >= total:
+        return None
+    return f"Mostrando {mostrados:,} de {total:,} puntos (muestra estratificada por línea de producto)."
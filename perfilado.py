@@ -0,0 +1,200 @@
+# Perfilado de cada ejecución del dashboard.
+# Con el perfilado activo (interruptor de la barra lateral, o G39_PERFILADO=1
+# para que empiece activado) se mide cada etapa de la ejecución: la carga, el
+# filtrado, las vistas del cubo y, por gráfico, la preparación de sus datos y el
+# dibujo. De cada etapa se guarda el tiempo y, si corresponde, las filas. El
+# desglose se muestra en la barra lateral junto con p50/p95 de las últimas
+# ejecuciones de la sesión, y si G39_PERFILADO_LOG tiene una ruta cada ejecución
+# se añade a ese archivo como una línea JSON (ver benchmarks/latencias.py).
+# El pico de memoria por etapa (tracemalloc) se mide solo con
+# G39_PERFILADO_MEMORIA=1: tracemalloc es del proceso y con él todo el código
+# Python corre varias veces más lento, en todas las sesiones. Por eso se activa
+# para el servidor y no desde la barra lateral; sin él 'pico_mb' queda en None,
+# y así se distinguen esos tiempos de los demás. Lo que se dibuja en el pool de
+# render_paralelo no cuenta, y con varias sesiones a la vez el pico de una etapa
+# puede incluir memoria de otra.
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ACTIVO_POR_DEFECTO = os.environ.get('G39_PERFILADO', '0') not in ('', '0')
+RUTA_LOG = os.environ.get('G39_PERFILADO_LOG')
+MEDIR_MEMORIA = os.environ.get('G39_PERFILADO_MEMORIA', '0') not in ('', '0')
+# Ejecuciones de la sesión sobre las que se calculan p50/p95 en el panel
+EJECUCIONES_RECIENTES = 50
+
+_lock = threading.Lock()
+# Perfiladores activos que siguen vivos: tracemalloc se detiene cuando se libera el último
+_midiendo = 0
+
+
+def _empezar_memoria():
+    global _midiendo
+    with _lock:
+        _midiendo += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _terminar_memoria():
+    global _midiendo
+    with _lock:
+        _midiendo -= 1
+        if _midiendo == 0:
+            tracemalloc.stop()
+
+
+def escribir_registro(registro, ruta):
+    """Añade `registro` como una línea JSON al final de `ruta`."""
+    linea = json.dumps(registro, ensure_ascii=False) + '\n'
+    with _lock, open(ruta, 'a', encoding='utf-8') as f:
+        f.write(linea)
+
+
+def leer_registros(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def resumir_latencias(registros):
+    """n, p50, p95 y máximo (ms) por etapa de una lista de registros de ejecución.
+
+    Las ejecuciones completas aportan además su duración total como etapa 'total'.
+    """
+    tiempos = {}
+    for registro in registros:
+        if registro['ejecucion'] == 'completa':
+            tiempos.setdefault('total', []).append(registro['segundos'])
+        for etapa in registro['etapas']:
+            tiempos.setdefault(etapa['etapa'], []).append(etapa['segundos'])
+    filas = {
+        nombre: {
+            'n': len(valores),
+            'p50_ms': np.percentile(valores, 50) * 1000,
+            'p95_ms': np.percentile(valores, 95) * 1000,
+            'max_ms': max(valores) * 1000,
+        }
+        for nombre, valores in tiempos.items()
+    }
+    return pd.DataFrame.from_dict(filas, orient='index').sort_values('p95_ms', ascending=False)
+
+
+class Perfilador:
+    """Tiempos, filas y (con `memoria`) pico de memoria de las etapas de una ejecución del script."""
+
+    def __init__(self, activo, seccion=None, ruta_log=RUTA_LOG, memoria=None):
+        self.activo = activo
+        self.memoria = activo and (MEDIR_MEMORIA if memoria is None else memoria)
+        self.seccion = seccion
+        self.ruta_log = ruta_log
+        contexto = get_script_run_ctx()
+        self.sesion = contexto.session_id if contexto is not None else 'local'
+        self.etapas = []
+        self._abiertas = []
+        # Una vez terminada la ejecución, las etapas de los fragmentos que se
+        # vuelven a ejecutar solos se registran por separado
+        self.terminado = False
+        self.inicio = time.perf_counter()
+        if self.memoria:
+            # Aunque la ejecución se interrumpa antes de terminar(), la medición de
+            # memoria se libera con el perfilador
+            _empezar_memoria()
+            weakref.finalize(self, _terminar_memoria)
+
+    def _actualizar_picos(self):
+        # El pico de tracemalloc es uno solo: se reparte entre las etapas abiertas
+        # y se reinicia, así cada etapa anidada mide el suyo
+        pico = tracemalloc.get_traced_memory()[1]
+        for etapa in self._abiertas:
+            etapa['_pico'] = max(etapa['_pico'], pico)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def etapa(self, nombre, **datos):
+        """Mide el bloque como la etapa `nombre`; se puede añadir información al dict que devuelve."""
+        etapa = {'etapa': nombre, 'nivel': len(self._abiertas), **datos}
+        if not self.activo:
+            yield etapa
+            return
+        if self.memoria:
+            self._actualizar_picos()
+            etapa['_memoria'] = etapa['_pico'] = tracemalloc.get_traced_memory()[0]
+        self._abiertas.append(etapa)
+        # Se guarda al empezar para que quede antes que las etapas anidadas
+        self.etapas.append(etapa)
+        inicio = time.perf_counter()
+        try:
+            yield etapa
+        finally:
+            etapa['segundos'] = time.perf_counter() - inicio
+            if self.memoria:
+                self._actualizar_picos()
+                etapa['pico_mb'] = (etapa.pop('_pico') - etapa.pop('_memoria')) / 2**20
+            self._abiertas.pop()
+            if self.terminado and not self._abiertas:
+                self._registrar('fragmento', sum(e['segundos'] for e in self.etapas if e['nivel'] == 0))
+
+    def _registrar(self, ejecucion, segundos):
+        registro = {
+            'momento': datetime.now().isoformat(timespec='milliseconds'),
+            'sesion': self.sesion,
+            'seccion': self.seccion,
+            'ejecucion': ejecucion,
+            'segundos': segundos,
+            'pico_mb': max((e['pico_mb'] for e in self.etapas), default=0.0) if self.memoria else None,
+            'etapas': self.etapas,
+        }
+        self.etapas = []
+        recientes = st.session_state.setdefault('perfilado', deque(maxlen=EJECUCIONES_RECIENTES))
+        recientes.append(registro)
+        if self.ruta_log:
+            escribir_registro(registro, self.ruta_log)
+        return registro
+
+    def terminar(self):
+        """Registra la ejecución completa; None si el perfilado no está activo."""
+        if not self.activo or self.terminado:
+            return None
+        registro = self._registrar('completa', time.perf_counter() - self.inicio)
+        self.terminado = True
+        return registro
+
+
+def mostrar_perfilado(registro):
+    """Desglose de la ejecución `registro` y p50/p95 de las ejecuciones recientes de la sesión."""
+    if registro is None:
+        return
+    with st.sidebar.expander("Perfilado", expanded=True):
+        if registro['pico_mb'] is not None:
+            st.caption(
+                f"Esta ejecución: {registro['segundos'] * 1000:.0f} ms · pico {registro['pico_mb']:.1f} MB "
+                "(tiempos con tracemalloc activo)"
+            )
+        else:
+            st.caption(f"Esta ejecución: {registro['segundos'] * 1000:.0f} ms")
+        desglose = pd.DataFrame([
+            {
+                'etapa': '\u2003' * etapa['nivel'] + etapa['etapa'],
+                'ms': etapa['segundos'] * 1000,
+                **({'pico MB': etapa['pico_mb']} if registro['pico_mb'] is not None else {}),
+                'filas': etapa.get('filas'),
+                'origen': etapa.get('origen'),
+            }
+            for etapa in registro['etapas']
+        ])
+        st.dataframe(desglose, hide_index=True, width='stretch')
+        recientes = st.session_state.get('perfilado', [])
+        st.caption(f"Últimas {len(recientes)} ejecuciones de la sesión")
+        st.dataframe(resumir_latencias(recientes).round(1), width='stretch')
@@ -0,0 +1,128 @@
+# Modo por bloques para archivos de ventas que no caben en memoria.
+# El CSV se recorre en bloques y cada bloque se acumula en los agregados que
+# usa el dashboard: el cubo (totales diarios, sumas y conteos por categoría),
+# los comomentos por celda de las columnas numéricas para la correlación, los
+# resúmenes estadísticos por celda (tabla 2.4 e histograma 2.3) y las series de
+# tiempo del gráfico 2.1. Las vistas por factura
+# (dispersión, 3D, boxplot) usan una muestra uniforme de tamaño fijo. La memoria
+# queda acotada por el tamaño del bloque, del cubo y de la muestra, no del archivo.
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import igualar_categorias, leer_bloques, version_archivo
+from correlacion import MotorCorrelacion
+from cubo import DIMENSIONES, combinar_cubos, construir_cubo
+from estadisticas import ResumenesCeldas
+from series_tiempo import SeriesTiempo
+
+FILAS_POR_BLOQUE = 250_000
+TAM_MUESTRA = 200_000
+# Por encima de este tamaño de CSV se usa el modo por bloques (G39_MODO_BLOQUES=1/0 lo fuerza)
+LIMITE_MB = float(os.environ.get('G39_LIMITE_MB', 1024))
+
+
+def usar_modo_bloques(ruta):
+    forzado = os.environ.get('G39_MODO_BLOQUES')
+    if forzado is not None:
+        return forzado == '1'
+    return os.path.getsize(ruta) > LIMITE_MB * 2**20
+
+
+class AgregadosPorBloques:
+
+    def __init__(self, tam_muestra=TAM_MUESTRA, semilla=39):
+        self.filas = 0
+        self.cubo = None
+        self.series = None
+        self.resumenes = None
+        self.motor = None
+        self.tam_muestra = tam_muestra
+        self.muestra = None
+        self._claves_muestra = np.empty(0)
+        self._muestra_nueva = False
+        self._rng = np.random.default_rng(semilla)
+
+    def agregar(self, bloque):
+        self.filas += len(bloque)
+
+        # Los agregados del bloque se suman en el momento a los acumulados (solo
+        # se recalculan las celdas que toca el bloque; las demás se copian). Cada
+        # suma crea objetos nuevos: una copia anterior de los agregados (modo en
+        # vivo) puede seguir usándolos
+        parcial = construir_cubo(bloque)
+        resumenes, motor = ResumenesCeldas.desde_datos(bloque), MotorCorrelacion.desde_datos(bloque)
+        series = SeriesTiempo.desde_datos(bloque)
+        if self.cubo is None:
+            self.cubo, self.resumenes, self.motor, self.series = parcial, resumenes, motor, series
+        else:
+            self.cubo, mapa, mapa_parcial = combinar_cubos(self.cubo, parcial)
+            celdas = self.cubo[DIMENSIONES]
+            self.resumenes = self.resumenes.sumar(resumenes, celdas, mapa, mapa_parcial)
+            self.motor = self.motor.sumar(motor, celdas, mapa, mapa_parcial)
+            self.series = self.series.sumar(series)
+
+        # Muestreo uniforme: cada fila recibe una clave aleatoria y se conservan
+        # las `tam_muestra` claves más pequeñas vistas hasta ahora. Con la muestra
+        # llena solo pueden entrar las filas con clave menor que la mayor guardada
+        claves = self._rng.random(len(bloque))
+        if len(self._claves_muestra) >= self.tam_muestra:
+            entran = claves < self._claves_muestra.max()
+            bloque, claves = bloque[entran], claves[entran]
+        if len(bloque) == 0:
+            return
+        claves = np.concatenate([self._claves_muestra, claves])
+        candidatas = bloque if self.muestra is None else pd.concat(igualar_categorias([self.muestra, bloque]), ignore_index=True)
+        if len(claves) > self.tam_muestra:
+            elegidas = np.argpartition(claves, self.tam_muestra)[:self.tam_muestra]
+            candidatas, claves = candidatas.iloc[elegidas], claves[elegidas]
+        self.muestra, self._claves_muestra = candidatas.reset_index(drop=True), claves
+        self._muestra_nueva = True
+
+    def finalizar(self):
+        """Deja lista la muestra (ordenada por fecha); se puede volver a llamar tras más bloques."""
+        if self.cubo is None:
+            return self  # sin filas todavía
+        if self._muestra_nueva:
+            orden = np.argsort(self.muestra['Date'].to_numpy(), kind='stable')
+            self.muestra = self.muestra.iloc[orden].reset_index(drop=True)
+            self._claves_muestra = self._claves_muestra[orden]
+            self._muestra_nueva = False
+        return self
+
+    def memoria_mb(self):
+        if self.cubo is None:
+            return 0.0
+        return float(
+            self.cubo.memory_usage(deep=True).sum() + self.muestra.memory_usage(deep=True).sum()
+        ) / 2**20
+
+
+def agregar_archivo(ruta, filas_por_bloque=FILAS_POR_BLOQUE, tam_muestra=TAM_MUESTRA):
+    agregados = AgregadosPorBloques(tam_muestra)
+    for bloque in leer_bloques(ruta, filas_por_bloque):
+        agregados.agregar(bloque)
+    return agregados.finalizar()
+
+
+@st.cache_resource(max_entries=2, show_spinner="Recorriendo el archivo por bloques...")
+def _agregar_en_cache(ruta, version):
+    inicio = time.perf_counter()
+    agregados = agregar_archivo(ruta)
+    info = {
+        'filas': agregados.filas,
+        'segundos': time.perf_counter() - inicio,
+        'memoria_mb': agregados.memoria_mb(),
+        'version': version,
+        'clave': (version, 'bloques'),
+    }
+    return agregados, info
+
+
+def cargar_por_bloques(ruta):
+    """Agregados por bloques compartidos entre sesiones; se recalculan al cambiar el archivo."""
+    return _agregar_en_cache(ruta, version_archivo(ruta))
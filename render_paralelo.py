@@ -0,0 +1,113 @@
+# Renderizado de gráficos en un pool de procesos.
+# Una vez filtrados los datos, los gráficos de una sección son independientes
+# entre sí: los que están visibles y no están en la caché se envían juntos a un
+# pool de procesos (backend Agg, sin interfaz). La página reserva el lugar de
+# cada uno (st.empty) y los va llenando en el orden en que el pool los termina,
+# no en el orden de la página: un gráfico lento no retrasa a los siguientes.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import streamlit as st
+
+from graficos import renderizar
+from perfilado import Perfilador
+
+
+def _iniciar_proceso():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+class RenderizadorParalelo:
+    """Pool de procesos para `graficos.renderizar`; sin pool (un solo núcleo) se renderiza en el hilo actual."""
+
+    def __init__(self, procesos=None):
+        procesos = procesos or os.cpu_count() or 1
+        self.procesos = procesos
+        # 'spawn' evita heredar por fork los hilos y el estado del servidor de Streamlit
+        self.pool = ProcessPoolExecutor(
+            max_workers=procesos, mp_context=get_context('spawn'), initializer=_iniciar_proceso,
+        ) if procesos > 1 else None
+
+    def enviar(self, funcion, *args, **kwargs):
+        """Future con el PNG del gráfico, o None si no hay pool."""
+        if self.pool is None:
+            return None
+        return self.pool.submit(renderizar, funcion, *args, **kwargs)
+
+
+@st.cache_resource
+def obtener_renderizador():
+    """Pool único por proceso, compartido por todas las sesiones."""
+    return RenderizadorParalelo()
+
+
+class PaginaGraficos:
+    """Gráficos de una ejecución del script: se registran, se adelantan en paralelo y se muestran."""
+
+    def __init__(self, cache, renderizador, clave_seleccion, perfilador=None):
+        self.cache = cache
+        self.renderizador = renderizador
+        self.clave_seleccion = clave_seleccion
+        self.perfilador = perfilador or Perfilador(activo=False)
+        self.especificaciones = {}
+        self.pendientes = {}
+        # id -> st.empty() reservado por mostrar() para un gráfico que está en el pool
+        self.lugares = {}
+
+    def registrar(self, id_grafico, funcion, preparar, **kwargs):
+        """`preparar()` devuelve la tupla de argumentos de `funcion`; solo se llama si hay que dibujar."""
+        self.especificaciones[id_grafico] = (funcion, preparar, kwargs)
+
+    def _clave(self, id_grafico):
+        # Los argumentos con nombre distinguen variantes del mismo gráfico
+        _, _, kwargs = self.especificaciones[id_grafico]
+        return (id_grafico, tuple(sorted(kwargs.items()))) + self.clave_seleccion
+
+    def _preparar(self, id_grafico):
+        _, preparar, _ = self.especificaciones[id_grafico]
+        with self.perfilador.etapa(f"{id_grafico} datos") as etapa:
+            argumentos = preparar()
+            etapa['filas'] = len(argumentos[0])
+        return argumentos
+
+    def adelantar(self, ids):
+        """Envía al pool los gráficos de `ids` que no están en la caché; sin pool no hace nada."""
+        # Sin pool cada gráfico se prepara y dibuja en mostrar(), en su lugar de la página
+        if self.renderizador.pool is None:
+            return
+        for id_grafico in ids:
+            if id_grafico in self.pendientes or self._clave(id_grafico) in self.cache:
+                continue
+            funcion, _, kwargs = self.especificaciones[id_grafico]
+            self.pendientes[id_grafico] = self.renderizador.enviar(funcion, *self._preparar(id_grafico), **kwargs)
+
+    def png(self, id_grafico):
+        """PNG de la caché o dibujado en el hilo actual."""
+        funcion, _, kwargs = self.especificaciones[id_grafico]
+        generar = lambda: renderizar(funcion, *self._preparar(id_grafico), **kwargs)  # noqa: E731
+        return self.cache.obtener_png(self._clave(id_grafico), generar)
+
+    def mostrar(self, id_grafico):
+        """Muestra el gráfico; si está en el pool solo reserva su lugar (lo llena completar())."""
+        if id_grafico in self.pendientes:
+            self.lugares[id_grafico] = st.empty()
+            return
+        # La etapa incluye el dibujo local (con la preparación de los datos anidada)
+        # y el envío de la imagen
+        with self.perfilador.etapa(f"{id_grafico} gráfico") as etapa:
+            etapa['origen'] = 'caché' if self._clave(id_grafico) in self.cache else 'local'
+            st.image(self.png(id_grafico), width='stretch')
+
+    def completar(self):
+        """Llena los lugares reservados por mostrar() a medida que el pool termina cada gráfico."""
+        futuros = {self.pendientes.pop(id_grafico): id_grafico for id_grafico in self.lugares}
+        for futuro in as_completed(futuros):
+            id_grafico = futuros[futuro]
+            # La etapa de cada gráfico va desde que terminó el anterior: la espera
+            # al pool que no se solapó con otro, más el envío de la imagen
+            with self.perfilador.etapa(f"{id_grafico} gráfico", origen='pool'):
+                png = self.cache.obtener_png(self._clave(id_grafico), futuro.result)
+                self.lugares.pop(id_grafico).image(png, width='stretch')
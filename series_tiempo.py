@@ -0,0 +1,172 @@
+# Series de tiempo preagregadas para el gráfico 2.1 (evolución de las ventas)
+# y la venta por hora del día.
+# Se guardan una sola vez las ventas diarias de cada combinación de valores de
+# los filtros (una matriz combinaciones x días) y las ventas por día,
+# combinación y hora. Un cambio de filtros o de fechas se resuelve sumando las
+# filas de las combinaciones elegidas en el tramo de días seleccionado, sin
+# volver a las filas originales; las vistas por semana y por mes se derivan de
+# la serie diaria. La resolución se elige según la longitud del rango.
+# En el modo por bloques, las series de cada bloque se suman a las acumuladas
+# (SeriesTiempo.sumar) sin volver a agrupar lo ya acumulado.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from carga_datos import COLUMNAS_CATEGORICAS, COLUMNAS_FILTRO, igualar_categorias, leer_version
+from cubo import colocar_filas, unir_claves, unir_codigos
+
+# Resolución -> (nombre, frecuencia de los periodos de pandas); las semanas van de lunes a domingo
+RESOLUCIONES = {
+    'D': ('día', 'D'),
+    'W': ('semana', 'W-SUN'),
+    'M': ('mes', 'M'),
+}
+# Se usa la resolución más fina que no supere este número de puntos en el gráfico
+MAX_PUNTOS = 120
+
+
+def agregar_por_hora(data, columna='Total'):
+    """Suma de `columna` por día, combinación de filtros y hora del día (de Timestamp)."""
+    tabla = data[COLUMNAS_FILTRO].assign(
+        Hora=data['Timestamp'].dt.hour.astype('int8'),
+        valor=data[columna].astype('float64'),
+    )
+    return tabla.groupby(COLUMNAS_FILTRO + ['Hora'], observed=True)['valor'].sum().reset_index()
+
+
+def elegir_resolucion(dias, max_puntos=MAX_PUNTOS):
+    """Resolución más fina con la que `dias` días caben en `max_puntos` puntos."""
+    if dias <= max_puntos:
+        return 'D'
+    if dias / 7 <= max_puntos:
+        return 'W'
+    return 'M'
+
+
+class SeriesTiempo:
+
+    def __init__(self, combinaciones, dias, diario, horas):
+        # combinaciones: claves (COLUMNAS_CATEGORICAS) de las filas de `diario`;
+        # dias: el calendario de sus columnas; horas: (día, combinación, hora,
+        # valor) de las celdas con ventas, ordenadas por día, combinación y hora,
+        # para que un rango de fechas sea un tramo contiguo
+        self.combinaciones = combinaciones
+        self.dias = dias
+        self.diario = diario
+        self.hora_dia, self.hora_combinacion, self.hora, self.hora_valor = horas
+        self.horas = np.flatnonzero(np.bincount(self.hora, minlength=24))
+        # Periodo de cada día en cada resolución, para derivar semanas y meses
+        self.periodos = {
+            resolucion: self.dias.to_period(frecuencia) for resolucion, (_, frecuencia) in RESOLUCIONES.items()
+        }
+
+    @classmethod
+    def desde_tabla(cls, tabla):
+        """Series de una tabla de agregar_por_hora."""
+        tabla = tabla[tabla['valor'].notna()]
+        grupos = tabla.groupby(COLUMNAS_CATEGORICAS, observed=True, sort=True)
+        combinacion = grupos.ngroup().to_numpy()
+        combinaciones = grupos.size().index.to_frame(index=False)
+
+        inicio = tabla['Date'].min()
+        dias = pd.date_range(inicio, tabla['Date'].max(), freq='D')
+        dia = (tabla['Date'] - inicio).dt.days.to_numpy()
+        valor = tabla['valor'].to_numpy()
+
+        # Matriz combinaciones x días (los días sin ventas quedan en cero)
+        n_comb, n_dias = len(combinaciones), len(dias)
+        diario = np.bincount(
+            combinacion * n_dias + dia, weights=valor, minlength=n_comb * n_dias,
+        ).reshape(n_comb, n_dias)
+
+        hora = tabla['Hora'].to_numpy()
+        orden = np.lexsort((hora, combinacion, dia))
+        return cls(combinaciones, dias, diario, (dia[orden], combinacion[orden], hora[orden], valor[orden]))
+
+    @classmethod
+    def desde_datos(cls, data, columna='Total'):
+        return cls.desde_tabla(agregar_por_hora(data, columna))
+
+    def sumar(self, parcial):
+        """Series con las ventas de `parcial` (otro bloque) sumadas a estas.
+
+        Las combinaciones y los días nuevos se intercalan: la matriz diaria se
+        copia ampliada y las celdas por hora se unen por su clave, sin volver a
+        agrupar las de estas series.
+        """
+        combinaciones, combinaciones_parcial = igualar_categorias([self.combinaciones, parcial.combinaciones])
+        mapa, mapa_parcial, _, n_comb = unir_claves(combinaciones, combinaciones_parcial, COLUMNAS_CATEGORICAS)
+        combinaciones = colocar_filas(combinaciones, combinaciones_parcial, mapa, mapa_parcial, n_comb)
+
+        inicio = min(self.dias[0], parcial.dias[0])
+        dias = pd.date_range(inicio, max(self.dias[-1], parcial.dias[-1]), freq='D')
+        desde, desde_parcial = (self.dias[0] - inicio).days, (parcial.dias[0] - inicio).days
+        diario = np.zeros((n_comb, len(dias)))
+        diario[mapa, desde:desde + len(self.dias)] = self.diario
+        diario[mapa_parcial, desde_parcial:desde_parcial + len(parcial.dias)] += parcial.diario
+
+        # Celdas por hora: una clave entera que se ordena por día, combinación y hora
+        def clave(dia, combinacion, hora):
+            return (dia * n_comb + combinacion) * 24 + hora
+
+        claves = clave(self.hora_dia + desde, mapa[self.hora_combinacion], self.hora)
+        claves_parcial = clave(parcial.hora_dia + desde_parcial, mapa_parcial[parcial.hora_combinacion], parcial.hora)
+        mapa_hora, mapa_hora_parcial, previa, largo = unir_codigos(claves, claves_parcial)
+        union = np.empty(largo, dtype='int64')
+        union[mapa_hora], union[mapa_hora_parcial] = claves, claves_parcial
+        valor = np.empty(largo)
+        valor[mapa_hora], valor[mapa_hora_parcial] = self.hora_valor, parcial.hora_valor
+        comunes = previa >= 0
+        valor[mapa_hora_parcial[comunes]] += self.hora_valor[previa[comunes]]
+        horas = union // 24 // n_comb, union // 24 % n_comb, (union % 24).astype(self.hora.dtype), valor
+        return type(self)(combinaciones, dias, diario, horas)
+
+    def _mascara(self, selecciones):
+        """Combinaciones que cumplen `selecciones` ({columna: valores})."""
+        mascara = np.ones(len(self.combinaciones), dtype=bool)
+        for col, valores in selecciones.items():
+            mascara &= self.combinaciones[col].isin(list(valores)).to_numpy()
+        return mascara
+
+    def tramo(self, rango_fechas=None):
+        """Días [lo, hi) del calendario que cubre `rango_fechas`, recortado a los datos."""
+        if rango_fechas is None:
+            return 0, len(self.dias)
+        lo = int(self.dias.searchsorted(pd.to_datetime(rango_fechas[0]), side='left'))
+        hi = int(self.dias.searchsorted(pd.to_datetime(rango_fechas[1]), side='right'))
+        return lo, max(lo, hi)
+
+    def serie(self, selecciones, rango_fechas=None, resolucion=None):
+        """(ventas de la selección por periodo, resolución usada).
+
+        La Series va indexada por el primer día de cada periodo dentro del rango;
+        con `resolucion` None se elige con elegir_resolucion según su longitud.
+        """
+        lo, hi = self.tramo(rango_fechas)
+        resolucion = resolucion or elegir_resolucion(hi - lo)
+        diario = self._mascara(selecciones) @ self.diario[:, lo:hi]
+        periodos = self.periodos[resolucion][lo:hi]
+        # Los días son consecutivos: el periodo de cada día, contado desde el primero, es su posición
+        codigos = periodos.asi8 - periodos.asi8[0] if hi > lo else periodos.asi8
+        valores = np.bincount(codigos, weights=diario, minlength=len(periodos.unique()))
+        indice = periodos.unique().start_time.rename('Date')
+        if hi > lo:
+            # La primera semana o mes puede empezar antes del rango
+            indice = indice.where(indice >= self.dias[lo], self.dias[lo])
+        return pd.Series(valores, index=indice, name='Total'), resolucion
+
+    def por_hora(self, selecciones, rango_fechas=None):
+        """Ventas de la selección por hora del día, en el rango de fechas."""
+        lo, hi = self.tramo(rango_fechas)
+        a, b = np.searchsorted(self.hora_dia, [lo, hi], side='left')
+        elegidas = self._mascara(selecciones)[self.hora_combinacion[a:b]]
+        valores = np.bincount(self.hora[a:b][elegidas], weights=self.hora_valor[a:b][elegidas], minlength=24)
+        return pd.Series(valores[self.horas], index=pd.Index(self.horas, name='Hora'), name='Total')
+
+
+@st.cache_resource(max_entries=2, show_spinner="Preparando series de tiempo...")
+def obtener_series(ruta, version):
+    """Series de tiempo compartidas entre sesiones para la versión `version` de los datos."""
+    data, _ = leer_version(ruta, version, COLUMNAS_FILTRO + ['Timestamp', 'Total'])
+    return SeriesTiempo.desde_datos(data)
@@ -0,0 +1,171 @@
+# Los agregados del dashboard contra pandas sobre las filas originales: data.csv
+# y unas facturas sintéticas de pocas combinaciones en cuatro meses (franjas
+# con muchas filas y rangos de fechas que cortan meses a medias).
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generar_facturas import generar_bloque
+from carga_datos import COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS, leer_bloques, leer_datos
+from correlacion import MotorCorrelacion
+from cubo import DIMENSIONES, construir_cubo
+from estadisticas import ResumenesCeldas
+from filtros import IndiceFiltros
+from incremental import AGRUPACIONES, VistasIncrementales
+from por_bloques import AgregadosPorBloques
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# (selecciones, rango de fechas) como los arma la barra lateral
+SELECCIONES = [
+    ({}, None),
+    ({'Payment': ['Cash', 'Ewallet']}, None),
+    ({'Branch': ['A'], 'Gender': ['Female']}, ('2019-01-10', '2019-02-20')),
+    ({'Product line': ['Health and beauty', 'Sports and travel'], 'Customer type': ['Member']}, ('2019-02-01', '2019-03-15')),
+    ({'City': ['Yangon']}, ('2019-03-05', '2019-03-05')),
+]
+CUARTILES = ['25%', '50%', '75%']
+
+
+@pytest.fixture(scope='module')
+def reales():
+    ruta = RAIZ / 'data.csv'
+    return leer_datos(ruta)[0], ruta
+
+
+@pytest.fixture(scope='module')
+def sinteticos(tmp_path_factory):
+    base = pd.read_csv(RAIZ / 'data.csv', usecols=COLUMNAS_CATEGORICAS).head(12)
+    ruta = tmp_path_factory.mktemp('sinteticos') / 'data.csv'
+    generar_bloque(base, 3000, np.random.default_rng(39), dias=120).to_csv(ruta, index=False)
+    return leer_datos(ruta)[0], ruta
+
+
+@pytest.fixture(params=['reales', 'sinteticos'])
+def datos(request):
+    return request.getfixturevalue(request.param)
+
+
+def filtrar(data, selecciones, rango):
+    """Máscara de las filas de la selección, con pandas."""
+    mascara = np.ones(len(data), dtype=bool)
+    for col, valores in selecciones.items():
+        mascara &= data[col].isin(valores).to_numpy()
+    if rango is not None:
+        mascara &= data['Date'].between(pd.Timestamp(rango[0]), pd.Timestamp(rango[1])).to_numpy()
+    return mascara
+
+
+def comparar_descripcion(resumen, filas, cuartiles=True):
+    esperado = filas.groupby('Customer type', observed=True)['Total'].describe()
+    assert list(resumen.index.astype(str)) == list(esperado.index.astype(str))
+    np.testing.assert_array_equal(resumen['count'].to_numpy(), esperado['count'].to_numpy())
+    columnas = ['mean', 'std'] + (CUARTILES if cuartiles else [])
+    np.testing.assert_allclose(resumen[columnas].to_numpy(), esperado[columnas].to_numpy(), rtol=1e-5)
+
+
+def comparar_histograma(histograma, filas):
+    esperado = filas['Rating'].round(1).value_counts().sort_index()
+    np.testing.assert_allclose(histograma['Rating'].to_numpy(), esperado.index.to_numpy(dtype='float64'), atol=1e-6)
+    np.testing.assert_array_equal(histograma['conteo'].to_numpy(), esperado.to_numpy())
+
+
+def comparar_correlacion(correlacion, filas):
+    pd.testing.assert_frame_equal(correlacion, filas[COLUMNAS_NUMERICAS].astype('float64').corr(), atol=1e-6)
+
+
+@pytest.mark.parametrize('selecciones, rango', SELECCIONES)
+def test_indices(datos, selecciones, rango):
+    data, _ = datos
+    # Filas en el orden del archivo y ordenadas por fecha (rango contiguo)
+    for tabla in (data, data.sort_values('Date', kind='stable').reset_index(drop=True)):
+        esperado = np.flatnonzero(filtrar(tabla, selecciones, rango))
+        np.testing.assert_array_equal(IndiceFiltros(tabla).indices(selecciones, rango), esperado)
+
+
+@pytest.mark.parametrize('selecciones, rango', SELECCIONES)
+def test_resumenes_y_correlacion(datos, selecciones, rango):
+    data, _ = datos
+    celdas = IndiceFiltros(construir_cubo(data)).indices(selecciones, rango)
+    filas = data[filtrar(data, selecciones, rango)]
+    resumenes = ResumenesCeldas.desde_datos(data)
+    # Ninguna franja pasa de K puntos: los cuartiles son exactos
+    assert resumenes.n_franja.max() <= 100
+    comparar_descripcion(resumenes.describir_por(celdas, 'Customer type'), filas)
+    comparar_histograma(resumenes.histograma(celdas), filas)
+    comparar_correlacion(MotorCorrelacion.desde_datos(data).correlacion(celdas), filas)
+
+
+@pytest.mark.parametrize('selecciones, rango', SELECCIONES[:4])
+def test_cuartiles_comprimidos(sinteticos, selecciones, rango):
+    data, _ = sinteticos
+    puntos = 10
+    resumenes = ResumenesCeldas.desde_datos(data, puntos_franja=puntos)
+    assert len(resumenes.valor) < len(data)
+    celdas = IndiceFiltros(construir_cubo(data)).indices(selecciones, rango)
+    filas = data[filtrar(data, selecciones, rango)]
+    resumen = resumenes.describir_por(celdas, 'Customer type')
+    comparar_descripcion(resumen, filas, cuartiles=False)
+    # Error en el rango de cada cuartil del orden de 1/K (más el escalado de meses cortados)
+    for tipo, grupo in filas.groupby('Customer type', observed=True)['Total']:
+        valores = np.sort(grupo.to_numpy(dtype='float64'))
+        for q in (0.25, 0.5, 0.75):
+            rango_estimado = np.searchsorted(valores, resumen.loc[tipo, f'{q:.0%}'], side='right') / len(valores)
+            assert abs(rango_estimado - q) <= 2 / puntos
+
+
+def test_vistas_incrementales(datos):
+    data, _ = datos
+    cubo = construir_cubo(data)
+    indice, vistas = IndiceFiltros(cubo), VistasIncrementales(cubo)
+    # Ida y vuelta: las vistas se actualizan sumando y restando celdas
+    for selecciones, rango in SELECCIONES + SELECCIONES[::-1]:
+        vistas.actualizar(indice.indices(selecciones, rango))
+        # El cubo suma en float64
+        filas = data[filtrar(data, selecciones, rango)].astype({'Total': 'float64'})
+        for nombre, dims in AGRUPACIONES.items():
+            vista = vistas.vista(nombre)
+            if not dims:
+                assert vista['n'].iloc[0] == len(filas)
+                assert vista['suma_Total'].iloc[0] == pytest.approx(filas['Total'].sum())
+                continue
+            esperado = filas.groupby(dims, observed=True)['Total'].agg(['size', 'sum'])
+            vista = vista.set_index(dims).sort_index()
+            assert list(vista.index) == list(esperado.index)
+            np.testing.assert_array_equal(vista['n'].to_numpy(), esperado['size'].to_numpy())
+            np.testing.assert_allclose(vista['suma_Total'].to_numpy(), esperado['sum'].to_numpy(), rtol=1e-9, atol=1e-6)
+
+
+def test_agregados_por_bloques(datos):
+    data, ruta = datos
+    # Bloques pequeños en el orden del archivo: fechas desordenadas y categorías
+    # que aparecen en bloques posteriores (cada bloque trae las suyas)
+    agregados = AgregadosPorBloques(tam_muestra=100)
+    for bloque in leer_bloques(ruta, filas_por_bloque=97):
+        agregados.agregar(bloque)
+    agregados.finalizar()
+    assert agregados.filas == len(data)
+
+    def como_texto(cubo):
+        cubo = cubo.astype({col: str for col in DIMENSIONES[1:]})
+        return cubo.sort_values(DIMENSIONES).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(como_texto(agregados.cubo), como_texto(construir_cubo(data)))
+
+    indice = IndiceFiltros(agregados.cubo)
+    for selecciones, rango in SELECCIONES:
+        celdas = indice.indices(selecciones, rango)
+        filas = data[filtrar(data, selecciones, rango)]
+        comparar_descripcion(agregados.resumenes.describir_por(celdas, 'Customer type'), filas)
+        comparar_histograma(agregados.resumenes.histograma(celdas), filas)
+        comparar_correlacion(agregados.motor.correlacion(celdas), filas)
+
+        serie, _ = agregados.series.serie(selecciones, rango, resolucion='D')
+        esperado = filas.groupby('Date')['Total'].sum().reindex(serie.index, fill_value=0)
+        np.testing.assert_allclose(serie.to_numpy(), esperado.to_numpy(), rtol=1e-5, atol=1e-6)
+        por_hora = agregados.series.por_hora(selecciones, rango)
+        esperado = filas.groupby(filas['Timestamp'].dt.hour)['Total'].sum().reindex(por_hora.index, fill_value=0)
+        np.testing.assert_allclose(por_hora.to_numpy(), esperado.to_numpy(), rtol=1e-5, atol=1e-6)